@@ -64,4 +64,4 @@ if [ "$DEBUG_MODE" = true ]; then
     export DEBUG_PORT=${DEBUG_PORT:-5678}
 fi
 
-uvicorn main:app --host 0.0.0.0 --port 8000 --reload
+uvicorn main:app --host 0.0.0.0 --port 8000 --loop uvloop --http httptools --no-access-log --reload
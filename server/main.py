@@ -1,13 +1,30 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from middleware import ExceptionHandlerMiddleware
-from main_router import router as main_router
-from notes import router as notes_router
+from main_router import router as main_router, render_root_page
+from notes import router as notes_router, close_services as close_notes_services
 
-# Load environment variables from .env file (look in parent directory as well)
-load_dotenv(dotenv_path='../.env')
+_DOTENV_LOADED_MARKER = "NOTEAPP_DOTENV_LOADED"
+
+def _load_env_once() -> None:
+    """Load environment variables from the .env file at most once per process tree.
+
+    Production environments are expected to inject variables directly, so the .env
+    file is skipped there. The marker is stored in os.environ so re-imports and
+    spawned uvicorn workers (which inherit the already-loaded values) skip parsing.
+    """
+    if os.environ.get(_DOTENV_LOADED_MARKER):
+        return
+    if os.environ.get("ENV") != "production":
+        # Load environment variables from .env file (look in parent directory as well)
+        load_dotenv(dotenv_path='../.env')
+    os.environ[_DOTENV_LOADED_MARKER] = "1"
+
+_load_env_once()
 
 # Check if debug mode is enabled
 DEBUG_MODE = os.environ.get("DEBUG_MODE", "false").lower() == "true"
@@ -28,16 +45,30 @@ if DEBUG_MODE:
         print(f"⚠️  Error in debug mode: {e}. Debug mode disabled.")
         DEBUG_MODE = False
 
+# Bake the final debug flag (after .env loading and any debugpy fallback) into the welcome page
+render_root_page(DEBUG_MODE)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan: release shared service resources (e.g. the Gemini connection) on shutdown."""
+    yield
+    await close_notes_services()
+
 app = FastAPI(
     title="NoteApp FastAPI",
     description="A modern FastAPI server application for note-taking with AI enrichment",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add custom exception handler middleware (must be first)
 app.add_middleware(ExceptionHandlerMiddleware)
 
-# Configure CORS to allow requests from the Next.js client
+# Configure CORS to allow requests from the Next.js client.
+# Middleware added last runs outermost, so CORS preflight requests are answered
+# before reaching the exception handler. Explicit method/header lists let
+# Starlette use its precomputed preflight headers instead of reflecting the request.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -45,8 +76,8 @@ app.add_middleware(
         "http://127.0.0.1:3000",  # Alternative localhost format
     ],
     allow_credentials=True,
-    allow_methods=["*"],  # Allow all HTTP methods
-    allow_headers=["*"],  # Allow all headers
+    allow_methods=["GET", "POST", "PATCH", "DELETE", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
 )
 
 # Include the main application router
@@ -57,4 +88,17 @@ app.include_router(notes_router)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop + httptools replace the pure-Python asyncio loop and h11 parser;
+    # access logging is disabled and the log level raised to keep per-request
+    # logging off the hot path (leave request logging to a fronting proxy).
+    # A single worker only: the notes store and enrichment cache live in process memory.
+    # The app object is passed directly, so uvicorn does not import (and run) this module a second time.
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        access_log=False,
+        log_level="warning",
+    )
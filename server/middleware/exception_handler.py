@@ -1,40 +1,64 @@
 import logging
-from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
-class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
-    """Middleware to catch all unhandled exceptions and return consistent HTTP 500 responses."""
-    
+# Static/documentation routes that are passed straight through without exception wrapping
+_EXCLUDED_PATHS: frozenset[str] = frozenset({"/", "/docs", "/redoc", "/openapi.json"})
+
+class ExceptionHandlerMiddleware:
+    """Middleware to catch all unhandled exceptions and return consistent HTTP 500 responses.
+
+    Implemented as a pure ASGI middleware rather than a BaseHTTPMiddleware, which
+    would add a task group and wrapped request/response streams to every request.
+    """
+
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
-    
-    async def dispatch(self, request: Request, call_next):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in _EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
         try:
             # Process the request normally
-            response = await call_next(request)
-            return response
-            
+            await self.app(scope, receive, send_wrapper)
+
         except Exception as exc:
             # Log the exception with request details
+            method = scope.get("method", "")
+            path = scope.get("path", "")
+            client = scope.get("client")
             logger.error(
-                f"Unhandled exception in {request.method} {request.url.path}: {str(exc)}",
+                f"Unhandled exception in {method} {path}: {str(exc)}",
                 exc_info=True,
                 extra={
-                    "method": request.method,
-                    "path": request.url.path,
-                    "client_ip": request.client.host if request.client else "unknown"
+                    "method": method,
+                    "path": path,
+                    "client_ip": client[0] if client else "unknown"
                 }
             )
-            
+
+            # A response that has already started cannot be replaced
+            if response_started:
+                raise
+
             # Return a generic HTTP 500 response
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=500,
                 content={
                     "detail": "Internal server error",
                     "error_type": "internal_error"
                 }
             )
+            await response(scope, receive, send)
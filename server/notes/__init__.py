@@ -1,3 +1,4 @@
 from .router import router
+from .dependencies import close_services
 
-__all__ = ["router"]
+__all__ = ["router", "close_services"]
@@ -1,14 +1,15 @@
 import os
-from fastapi import Depends
+from functools import lru_cache
 import google.generativeai as genai
 from .services.llm_stub_service import LLMStubService
 from .services.gemini_service import GeminiService
 from .services.notes_service import NotesService
-from .interfaces import LLMServiceProtocol
-from .models.enums import GeminiModel
+from .services.in_memory_cache_backend import InMemoryCacheBackend
+from .models import GeminiModel
 
-def get_gemini_api_key() -> str:
-    """Dependency function that provides a Gemini API key."""
+@lru_cache(maxsize=1)
+def _get_gemini_api_key() -> str:
+    """Provide the Gemini API key, read from the environment once."""
     api_key = os.environ.get("GEMINI_API_KEY")
     if not api_key:
         raise ValueError(
@@ -17,20 +18,47 @@ def get_gemini_api_key() -> str:
         )
     return api_key
 
-def get_gemini_model(api_key: str = Depends(get_gemini_api_key)) -> genai.GenerativeModel:
-    """Dependency function that provides a configured Gemini model."""
-    genai.configure(api_key=api_key)
+# The Gemini SDK talks gRPC over a single HTTP/2 channel: genai.configure() resets the
+# SDK's client cache, and each GenerativeModel lazily opens its async client on first use.
+# Configuring once and sharing one model keeps that channel (and its TLS session) alive
+# and multiplexes concurrent enrichments over it, so neither may be rebuilt per request.
+@lru_cache(maxsize=1)
+def _get_gemini_model() -> genai.GenerativeModel:
+    """Provide the shared Gemini model, configured once."""
+    genai.configure(api_key=_get_gemini_api_key())
     model_name = GeminiModel.FLASH
     return genai.GenerativeModel(model_name)
 
-def get_gemini_service(gemini_model: genai.GenerativeModel = Depends(get_gemini_model)) -> GeminiService:
-    """Dependency function that provides a GeminiService instance."""
-    return GeminiService(gemini_model=gemini_model)
+@lru_cache(maxsize=1)
+def _get_gemini_service() -> GeminiService:
+    """Provide the shared GeminiService instance, caching enrichments in memory."""
+    return GeminiService(gemini_model=_get_gemini_model(), cache_backend=InMemoryCacheBackend())
+
+@lru_cache(maxsize=1)
+def _get_notes_service() -> NotesService:
+    """Provide the shared NotesService instance, built on first use."""
+    return NotesService(_get_gemini_service())
 
 def get_llm_stub_service() -> LLMStubService:
     """Dependency function that provides an LLMStubService instance."""
     return LLMStubService()
 
-def get_notes_service(llm_service: LLMServiceProtocol = Depends(get_gemini_service)) -> NotesService:
-    """Dependency function that provides a NotesService instance."""
-    return NotesService(llm_service)
+async def get_notes_service() -> NotesService:
+    """
+    Dependency function that provides the shared NotesService instance.
+
+    A single async dependency node: FastAPI resolves no sub-dependencies and,
+    unlike a sync dependency, does not dispatch it to the threadpool.
+    """
+    return _get_notes_service()
+
+async def close_services() -> None:
+    """
+    Release resources held by the shared services, if they were ever created, and drop them
+    so a later application lifespan builds fresh services instead of reusing closed ones.
+    """
+    if _get_gemini_service.cache_info().currsize:
+        await _get_gemini_service().aclose()
+    _get_notes_service.cache_clear()
+    _get_gemini_service.cache_clear()
+    _get_gemini_model.cache_clear()
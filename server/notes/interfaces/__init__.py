@@ -1,5 +1,7 @@
 from .llm_service_protocol import LLMServiceProtocol
+from .cache_backend_protocol import CacheBackendProtocol
 
 __all__ = [
-    "LLMServiceProtocol"
+    "LLMServiceProtocol",
+    "CacheBackendProtocol"
 ]
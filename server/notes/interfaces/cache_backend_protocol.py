@@ -0,0 +1,28 @@
+from typing import Any, Dict, Optional, Protocol
+
+class CacheBackendProtocol(Protocol):
+    """Protocol defining the interface for enrichment cache backends."""
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached value.
+        
+        Args:
+            key: The cache key
+            
+        Returns:
+            The cached value, or None if it is missing or expired. Values are trusted as
+            stored, so a backend that serializes them must restore the same Python types.
+        """
+        ...
+    
+    async def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """
+        Store a value in the cache.
+        
+        Args:
+            key: The cache key
+            value: The value to cache
+            ttl: Time to live in seconds, or None to use the backend default
+        """
+        ...
@@ -1,7 +1,6 @@
-from typing import Protocol, runtime_checkable
+from typing import AsyncIterator, List, Protocol
 from ..models import Note, LLMEnrichment
 
-@runtime_checkable
 class LLMServiceProtocol(Protocol):
     """Protocol defining the interface for LLM services."""
     
@@ -19,3 +18,34 @@ class LLMServiceProtocol(Protocol):
             Exception: If enrichment generation fails
         """
         ...
+    
+    async def generate_enrichments_batch(self, notes: List[Note]) -> List[LLMEnrichment]:
+        """
+        Generate enrichments for several notes using an LLM.
+        
+        Args:
+            notes: The notes to generate enrichments for
+            
+        Returns:
+            List[LLMEnrichment]: The generated enrichments, in the same order as notes
+            
+        Raises:
+            Exception: If enrichment generation fails
+        """
+        ...
+    
+    async def stream_enrichments(self, note: Note) -> AsyncIterator[bytes]:
+        """
+        Start streaming the raw LLM response for a note's enrichments and return its chunks.
+        The LLM request is made before returning, so failures are raised before any streaming begins.
+        
+        Args:
+            note: The note to generate enrichments for
+            
+        Returns:
+            AsyncIterator[bytes]: Batches of the UTF-8 encoded response
+            
+        Raises:
+            Exception: If enrichment generation fails
+        """
+        ...
@@ -1,14 +1,17 @@
 from .exceptions import UnauthorizedAccessError
-from .enums import Sentiment
-from .note_models import NoteBase, NoteCreate, NoteUpdate, Note
-from .llm_models import LLMEnrichment
+from .enums import Sentiment, GeminiModel
+from .note_models import NoteBase, NoteCreate, NoteUpdate, Note, NOTE_LIST_ADAPTER
+from .llm_models import LLMEnrichment, LLMBatchEnrichment
 
 __all__ = [
     "UnauthorizedAccessError",
     "Sentiment", 
+    "GeminiModel",
     "NoteBase",
     "NoteCreate",
     "NoteUpdate",
     "Note",
-    "LLMEnrichment"
+    "NOTE_LIST_ADAPTER",
+    "LLMEnrichment",
+    "LLMBatchEnrichment"
 ]
@@ -13,3 +13,8 @@ class LLMEnrichment(BaseModel):
     complexity_score: float = Field(..., description="Calculated complexity score between 0 and 1 of the note content")
     enrichment_timestamp: Optional[datetime] = Field(None, description="Timestamp when enrichment was generated")
     llm_model: Optional[str] = Field(None, description="Name/version of the LLM model used")
+
+
+class LLMBatchEnrichment(LLMEnrichment):
+    """Model for one result of a batched enrichment, tagged with the index of the note it belongs to."""
+    index: int = Field(..., description="Index of the note these enrichments were generated for, as given in the prompt")
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Dict, Any, Optional
+from pydantic import BaseModel, Field, TypeAdapter, model_validator
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone
 from uuid import UUID, uuid4
 
@@ -24,15 +24,16 @@ class Note(NoteBase):
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="Timestamp of last revision")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="JSON metadata field for anything")
     
-    def __init__(self, **data):
-        super().__init__(**data)
-        # Ensure updated_at is exactly the same as created_at for new notes
-        if 'updated_at' not in data:
-            # If no updated_at provided, use the same timestamp as created_at
-            self.updated_at = self.created_at
+    @model_validator(mode="before")
+    @classmethod
+    def _default_updated_at(cls, data: Any) -> Any:
+        """Ensure updated_at is exactly the same as created_at for new notes."""
+        if isinstance(data, dict) and "updated_at" not in data:
+            # If no updated_at provided, use the same timestamp as created_at,
+            # taking a single clock reading when neither is provided
+            created_at = data["created_at"] if "created_at" in data else datetime.now(timezone.utc)
+            data = {**data, "created_at": created_at, "updated_at": created_at}
+        return data
 
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            UUID: lambda v: str(v)
-        }
+# Prebuilt adapter for serializing note lists directly in pydantic-core
+NOTE_LIST_ADAPTER: TypeAdapter[List[Note]] = TypeAdapter(List[Note])
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Dict, Any
 from uuid import UUID
 from .dependencies import get_notes_service
 from .services.notes_service import NotesService
-from .models import Note, NoteCreate, NoteUpdate, UnauthorizedAccessError
+from .models import Note, NoteCreate, NoteUpdate, UnauthorizedAccessError, NOTE_LIST_ADAPTER
 
 router = APIRouter(
     prefix="/notes",
@@ -25,15 +26,13 @@ async def create_note(
 
 @router.get("/", response_model=List[Note])
 async def get_notes(
-    user_id: str = Query(..., description="User ID to fetch notes for"),
+    user_id: str = Query(..., min_length=1, description="User ID to fetch notes for"),
     notes_service: NotesService = Depends(get_notes_service)
-) -> List[Note]:
+) -> Response:
     """Retrieve all notes belonging to a specific user."""
-    if user_id == "":
-        notes = []
-        return notes
     notes = await notes_service.get_notes_by_user(user_id)
-    return notes
+    # Serialize the whole list in one pydantic-core pass, skipping per-item response validation
+    return Response(content=NOTE_LIST_ADAPTER.dump_json(notes), media_type="application/json")
 
 @router.get("/{note_id}", response_model=Note)
 async def get_note(
@@ -70,6 +69,25 @@ async def enrich_note_with_llm(
     except HTTPException as e:
         raise e
 
+@router.get("/{note_id}/enrich/stream")
+async def stream_note_enrichments(
+    note_id: UUID,
+    user_id: str = Query(..., description="User ID to verify ownership"),
+    notes_service: NotesService = Depends(get_notes_service)
+) -> StreamingResponse:
+    """Stream LLM-generated enrichments for a note as they are generated, without storing them."""
+    try:
+        chunks = await notes_service.stream_note_enrichments(note_id, user_id)
+        if chunks is None:
+            raise HTTPException(status_code=404, detail="Note not found")
+        # The LLM request has already been made, so its failures surface as errors rather than as
+        # an empty 200 stream; the service yields pre-batched chunks, each written to the client as-is
+        return StreamingResponse(chunks, media_type="text/plain; charset=utf-8")
+    except UnauthorizedAccessError:
+        raise HTTPException(status_code=403, detail="Access denied: Note does not belong to this user")
+    except HTTPException as e:
+        raise e
+
 @router.patch("/{note_id}", response_model=Note)
 async def update_note(
     note_id: UUID,
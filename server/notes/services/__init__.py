@@ -1,9 +1,11 @@
 from .notes_service import NotesService
 from .gemini_service import GeminiService
 from .llm_stub_service import LLMStubService
+from .in_memory_cache_backend import InMemoryCacheBackend
 
 __all__ = [
     "NotesService",
     "GeminiService",
-    "LLMStubService"
+    "LLMStubService",
+    "InMemoryCacheBackend"
 ]
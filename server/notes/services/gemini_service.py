@@ -1,25 +1,338 @@
-import json
-from typing import Dict, Any, Optional
-from pydantic import ValidationError
+import asyncio
+import hashlib
+import re
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Set, Tuple
+from pydantic import TypeAdapter, ValidationError
 from datetime import datetime, timezone
 import google.generativeai as genai
-from ..models import Note, LLMEnrichment, Sentiment
-from ..interfaces import LLMServiceProtocol
+from google.generativeai import client as genai_client
+import orjson
+from ..models import Note, LLMEnrichment, LLMBatchEnrichment, Sentiment
+from ..interfaces import LLMServiceProtocol, CacheBackendProtocol
 
 # Maximum number of attempts for structured response generation
 MAX_ATTEMPTS = 3
 
+# Number of concurrent speculative calls made on the first attempt; the first to validate wins
+PARALLEL_ATTEMPTS = 2
+
+# Total Gemini calls made for a single note: the speculative first attempt, then serial retries
+SINGLE_NOTE_CALLS = PARALLEL_ATTEMPTS + MAX_ATTEMPTS - 1
+
+# Maximum number of notes sent to Gemini in a single batched prompt
+BATCH_CHUNK_SIZE = 10
+
+# Output token budget per note; batched calls scale it by the number of notes in the prompt
+MAX_OUTPUT_TOKENS_PER_NOTE = 2048
+
+# Maximum number of batched prompts in flight at once for large batches
+MAX_BATCH_CONCURRENCY = 4
+
+# How long concurrent enrichment requests are buffered to be sent as one batch, in seconds
+COALESCE_WINDOW_SECONDS = 0.02
+
+# Time to live for cached enrichments, in seconds
+ENRICHMENT_CACHE_TTL_SECONDS = 3600
+
+# Streamed response text is buffered and flushed once it reaches this many bytes...
+STREAM_FLUSH_BYTES = 64
+
+# ...or once this long has passed since the last flush, in seconds
+STREAM_FLUSH_INTERVAL_SECONDS = 0.05
+
+# Runs of punctuation, underscores and whitespace, collapsed when normalizing cache keys
+_NON_ALPHANUMERIC_RE = re.compile(r"[\W_]+")
+
+# A markdown code block (``` or ~~~ fenced, optionally tagged json) and its body: either the opening fence ends
+# its line and the body runs to a closing fence that ends a line (or, if unclosed, to the end), or the whole
+# block is on one line. A fence inside a JSON string value is followed by more of the string on the same line,
+# so it matches neither form and is left alone
+_FENCE_RE = re.compile(
+    r"(```|~~~)(?:json)?[ \t]*(?:\r?\n([\s\S]*?)(?:\1[ \t]*\r?$|\Z)|([^\r\n]*?)\1[ \t]*\r?$)",
+    re.M
+)
+
+# JSON schema for structured output, generated and serialized once at import
+_LLM_ENRICHMENT_SCHEMA: Dict[str, Any] = LLMEnrichment.model_json_schema()
+_LLM_ENRICHMENT_SCHEMA_JSON: str = orjson.dumps(_LLM_ENRICHMENT_SCHEMA, option=orjson.OPT_INDENT_2).decode()
+
+# Array schema and validator for batched structured output, each item echoing its note's index
+_LLM_BATCH_ENRICHMENT_LIST_ADAPTER: TypeAdapter[List[LLMBatchEnrichment]] = TypeAdapter(List[LLMBatchEnrichment])
+_LLM_ENRICHMENT_BATCH_SCHEMA_JSON: str = orjson.dumps(
+    _LLM_BATCH_ENRICHMENT_LIST_ADAPTER.json_schema(),
+    option=orjson.OPT_INDENT_2
+).decode()
+
+# Joins prompt segments in one allocation, instead of a copy per `+`
+_join_segments = "".join
+
+# Prompt segments, joined around the note content and validation error per call
+_PROMPT_PREFIX = """
+You are an AI assistant that analyzes notes and generates enrichments. 
+
+Please analyze the following note content and provide insights for:
+- A concise summary (2-3 sentences)
+- Key topics and themes
+- Sentiment analysis (positive, negative, or neutral)
+- Important entities (people, places, concepts)
+- Relevant tags for categorization
+- Complexity assessment (0.0 to 1.0 scale)
+
+Note content:
+"""
+
+_PROMPT_SUFFIX = """
+
+Please provide your analysis in the requested structured format. 
+Note: Do not include enrichment_timestamp or llm_model fields - these will be set automatically.
+"""
+
+_ERROR_FEEDBACK_PREFIX = """
+
+IMPORTANT: The previous attempt to generate a JSON response failed with this validation error:
+"""
+
+_ERROR_FEEDBACK_SUFFIX = """
+
+Please carefully review the schema requirements and ensure your response exactly matches the expected format. Pay special attention to:
+- Required fields that must be present
+- Correct data types for each field
+- Proper enum values where specified
+- Correct field names and structure
+
+"""
+
+_STRUCTURED_SUFFIX = f"""
+
+Please respond with a JSON object that matches this exact schema:
+
+{_LLM_ENRICHMENT_SCHEMA_JSON}
+
+Return only the JSON object, no additional text or formatting.
+"""
+
+# Batched prompt segments, joined around the JSON-encoded list of notes
+_BATCH_PROMPT_PREFIX = """
+You are an AI assistant that analyzes notes and generates enrichments. 
+
+Please analyze each of the following notes independently and provide, for each note, insights for:
+- A concise summary (2-3 sentences)
+- Key topics and themes
+- Sentiment analysis (positive, negative, or neutral)
+- Important entities (people, places, concepts)
+- Relevant tags for categorization
+- Complexity assessment (0.0 to 1.0 scale)
+
+Notes (a JSON array of objects with the note index and content):
+"""
+
+_BATCH_PROMPT_SUFFIX = """
+
+Please provide your analysis in the requested structured format, with exactly one result per note, in the same order as the notes above, and with each result's index set to the index of its note. 
+Note: Do not include enrichment_timestamp or llm_model fields - these will be set automatically.
+"""
+
+_BATCH_STRUCTURED_SUFFIX = f"""
+
+Please respond with a JSON array that matches this exact schema, containing one object per note in the same order, each with its note's index:
+
+{_LLM_ENRICHMENT_BATCH_SCHEMA_JSON}
+
+Return only the JSON array, no additional text or formatting.
+"""
+
+# Generation settings shared by every single-note structured output call
+_GENERATION_CONFIG = genai.types.GenerationConfig(
+    temperature=0.1,  # Lower temperature for more consistent structured output
+    top_p=0.8,
+    top_k=40,
+    max_output_tokens=MAX_OUTPUT_TOKENS_PER_NOTE,
+)
+
+# Batched calls share the sampling settings, with the output budget (which on thinking models
+# also covers thinking tokens) scaled to a full chunk so a batch response is not truncated
+_BATCH_GENERATION_CONFIG = genai.types.GenerationConfig(
+    temperature=_GENERATION_CONFIG.temperature,
+    top_p=_GENERATION_CONFIG.top_p,
+    top_k=_GENERATION_CONFIG.top_k,
+    max_output_tokens=MAX_OUTPUT_TOKENS_PER_NOTE * BATCH_CHUNK_SIZE,
+)
+
+class BatchValidationError(Exception):
+    """Raised when a batched call keeps returning output that fails validation or doesn't match its notes."""
+
+class _BatchCoalescer:
+    """
+    Coalesces concurrently submitted notes from the same user into batches.
+    
+    A user's first submission opens a batch for up to `window` seconds; that user's notes
+    arriving within it (up to `max_batch_size`) are passed to `flush` together, so one prompt
+    never mixes different users' notes. Each submitter receives its own result. If the batch
+    fails with a BatchValidationError, each note is retried on its own with `fallback`, so one
+    bad note or a truncated batch response only fails the requests it actually affects; any
+    other error (e.g. a rate limit or outage) is passed to every submitter without retrying.
+    """
+    
+    def __init__(
+        self,
+        flush: Callable[[List[Note]], Awaitable[List[LLMEnrichment]]],
+        fallback: Callable[[Note], Awaitable[LLMEnrichment]],
+        window: float,
+        max_batch_size: int
+    ):
+        self._flush = flush
+        self._fallback = fallback
+        self._window = window
+        self._max_batch_size = max_batch_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._open_batches: Dict[str, List[Tuple[Note, asyncio.Future]]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def submit(self, note: Note) -> LLMEnrichment:
+        """Add a note to its user's open batch (opening one if needed) and wait for its enrichments."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Batches opened on a previous event loop can never be dispatched, so start afresh
+            self._loop = loop
+            self._open_batches = {}
+            self._tasks = set()
+        
+        future = loop.create_future()
+        batch = self._open_batches.get(note.user_id)
+        if batch is None:
+            batch = self._open_batches[note.user_id] = []
+            self._spawn(self._close_after_window(note.user_id, batch))
+        batch.append((note, future))
+        if len(batch) >= self._max_batch_size:
+            self._close(note.user_id, batch)
+        return await future
+    
+    async def aclose(self) -> None:
+        """Cancel the open batches and in-flight dispatches, with their waiting submitters, and wait for them."""
+        for batch in self._open_batches.values():
+            for _, future in batch:
+                future.cancel()
+        self._open_batches = {}
+        
+        tasks, self._tasks = self._tasks, set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def _spawn(self, coroutine: Awaitable[None]) -> None:
+        """Run a background task, holding a reference until it finishes."""
+        task = self._loop.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _close_after_window(self, user_id: str, batch: List[Tuple[Note, asyncio.Future]]) -> None:
+        """Close a user's batch once its window has passed, unless it already filled up."""
+        await asyncio.sleep(self._window)
+        self._close(user_id, batch)
+    
+    def _close(self, user_id: str, batch: List[Tuple[Note, asyncio.Future]]) -> None:
+        """Stop accepting notes into a batch and dispatch it, if it is still the user's open batch."""
+        if self._open_batches.get(user_id) is batch:
+            del self._open_batches[user_id]
+            self._spawn(self._dispatch(batch))
+    
+    async def _dispatch(self, batch: List[Tuple[Note, asyncio.Future]]) -> None:
+        """Enrich a batch and fan the results back out to the waiting submitters."""
+        # Skip submitters that stopped waiting (e.g. cancelled requests)
+        pending = [(note, future) for note, future in batch if not future.done()]
+        if not pending:
+            return
+        
+        try:
+            await self._resolve(pending)
+        except asyncio.CancelledError:
+            # Cancelled by aclose(): don't leave the submitters waiting on a batch that will never finish
+            for _, future in pending:
+                future.cancel()
+            raise
+    
+    async def _resolve(self, pending: List[Tuple[Note, asyncio.Future]]) -> None:
+        """Resolve each submitter with its note's enrichments, falling back to per-note calls if the batch fails."""
+        try:
+            results = await self._flush([note for note, _ in pending])
+        except BatchValidationError:
+            # Only invalid batch output is worth retrying note by note
+            await asyncio.gather(*(self._resolve_one(note, future) for note, future in pending))
+            return
+        except Exception as e:
+            # API errors would recur for every note, so retrying each would only add load
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        # The flush returns results in note order, having matched them to notes by index
+        for (_, future), enrichments in zip(pending, results):
+            if not future.done():
+                future.set_result(enrichments)
+    
+    async def _resolve_one(self, note: Note, future: asyncio.Future) -> None:
+        """Enrich a single note with the fallback and resolve its submitter."""
+        if future.done():
+            return
+        try:
+            enrichments = await self._fallback(note)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(enrichments)
+
 class GeminiService(LLMServiceProtocol):
     """Real LLM service using Google's Gemini API for generating note enrichments."""
     
-    def __init__(self, gemini_model: genai.GenerativeModel):
-        """Initialize the LLM service with a configured Gemini model."""       
+    def __init__(
+        self,
+        gemini_model: genai.GenerativeModel,
+        cache_backend: Optional[CacheBackendProtocol] = None,
+        coalesce_window: float = COALESCE_WINDOW_SECONDS
+    ):
+        """
+        Initialize the LLM service with a configured Gemini model.
+        
+        Args:
+            gemini_model: The configured Gemini model
+            cache_backend: Optional cache for enrichments keyed on normalized note content
+            coalesce_window: How long concurrent enrichment requests are buffered into one batch
+        """
         self.model = gemini_model
+        self.cache_backend = cache_backend
+        self._coalescer = _BatchCoalescer(
+            self._generate_batch_uncached,
+            self._generate_uncached,
+            window=coalesce_window,
+            max_batch_size=BATCH_CHUNK_SIZE
+        )
+        
+    async def aclose(self) -> None:
+        """
+        Release the service's background tasks and the Gemini connection.
+        Called once on application shutdown; the service should not be used afterwards.
+        """
+        await self._coalescer.aclose()
+        
+        # The SDK opens its async gRPC client lazily on the model and exposes no public close
+        async_client = getattr(self.model, "_async_client", None)
+        if async_client is not None:
+            await async_client.transport.close()
+            self.model._async_client = None
+            # The model fetches that same client from the SDK's process-wide cache, so drop it
+            # there too; otherwise the next model to make a call would reuse the closed channel
+            cached_clients = genai_client._client_manager.clients
+            if cached_clients.get("generative_async") is async_client:
+                del cached_clients["generative_async"]
         
     async def generate_enrichments(self, note: Note) -> LLMEnrichment:
         """
         Generate enrichments for a note using Gemini API with function calling.
-        Includes retry logic with error feedback for structured response validation.
+        Enrichments for previously seen content are served from the cache backend, if any;
+        otherwise the note is coalesced with the same user's concurrent requests into a single batched call.
         
         Args:
             note: The note to generate enrichments for
@@ -27,26 +340,226 @@ class GeminiService(LLMServiceProtocol):
         Returns:
             LLMEnrichment: The generated enrichments
             
+        Raises:
+            Exception: If enrichment generation fails after SINGLE_NOTE_CALLS attempts
+        """
+        if self.cache_backend is None:
+            return await self._coalescer.submit(note)
+        
+        cache_key = self._cache_key(note)
+        cached = await self.cache_backend.get(cache_key)
+        if cached is not None:
+            return self._enrichment_from_cache(cached)
+        
+        enrichments = await self._coalescer.submit(note)
+        await self.cache_backend.set(cache_key, enrichments.model_dump(), ttl=ENRICHMENT_CACHE_TTL_SECONDS)
+        return enrichments
+    
+    async def generate_enrichments_batch(self, notes: List[Note]) -> List[LLMEnrichment]:
+        """
+        Generate enrichments for several notes, packing them into as few Gemini calls as possible.
+        Cached notes are served from the cache backend; the rest are sent in batched prompts
+        of up to BATCH_CHUNK_SIZE notes, with at most MAX_BATCH_CONCURRENCY prompts in flight.
+        
+        Args:
+            notes: The notes to generate enrichments for
+            
+        Returns:
+            List[LLMEnrichment]: The generated enrichments, in the same order as notes
+            
         Raises:
             Exception: If enrichment generation fails after MAX_ATTEMPTS
         """
+        results: List[Optional[LLMEnrichment]] = [None] * len(notes)
+        misses: List[Tuple[int, Note]] = []
+        
+        for index, note in enumerate(notes):
+            cached = None
+            if self.cache_backend is not None:
+                cached = await self.cache_backend.get(self._cache_key(note))
+            if cached is not None:
+                results[index] = self._enrichment_from_cache(cached)
+            else:
+                misses.append((index, note))
+        
+        if misses:
+            generated = await self._generate_batch_uncached([note for _, note in misses])
+            for (index, note), enrichments in zip(misses, generated):
+                results[index] = enrichments
+                if self.cache_backend is not None:
+                    await self.cache_backend.set(self._cache_key(note), enrichments.model_dump(), ttl=ENRICHMENT_CACHE_TTL_SECONDS)
+        
+        return results
+    
+    async def stream_enrichments(self, note: Note) -> AsyncIterator[bytes]:
+        """
+        Start streaming the raw structured response for a note and return its chunks.
+        The Gemini call is made, and its first chunk read, before returning, so API errors are
+        raised here rather than after a streaming response has started.
+        Response chunks are buffered and yielded once STREAM_FLUSH_BYTES have accumulated or
+        STREAM_FLUSH_INTERVAL_SECONDS have passed, rather than forwarding every token.
+        The streamed text is neither validated nor cached.
+        
+        Args:
+            note: The note to generate enrichments for
+            
+        Returns:
+            AsyncIterator[bytes]: UTF-8 encoded batches of the response text
+            
+        Raises:
+            Exception: If the Gemini API call fails
+        """
+        structured_prompt = _join_segments(("\n", self._create_analysis_prompt(note), _STRUCTURED_SUFFIX))
+        
+        try:
+            response = await self.model.generate_content_async(
+                structured_prompt,
+                generation_config=_GENERATION_CONFIG,
+                stream=True
+            )
+            chunks = response.__aiter__()
+            # A streamed call may only report its error on the first read
+            first_chunk = await anext(chunks, None)
+        except Exception as e:
+            raise Exception(f"Gemini API call failed: {e}")
+        
+        return self._buffer_stream(first_chunk, chunks)
+    
+    async def _buffer_stream(self, first_chunk: Any, chunks: AsyncIterator[Any]) -> AsyncIterator[bytes]:
+        """Buffer the text of a streamed response, starting from its already-read first chunk."""
+        if first_chunk is None:
+            return
+        
+        loop = asyncio.get_running_loop()
+        buffer = bytearray(first_chunk.text.encode("utf-8"))
+        last_flush = loop.time()
+        async for chunk in chunks:
+            buffer += chunk.text.encode("utf-8")
+            now = loop.time()
+            if len(buffer) >= STREAM_FLUSH_BYTES or now - last_flush >= STREAM_FLUSH_INTERVAL_SECONDS:
+                yield bytes(buffer)
+                buffer.clear()
+                last_flush = now
+        
+        if buffer:
+            yield bytes(buffer)
+    
+    def _enrichment_from_cache(self, cached: Dict[str, Any]) -> LLMEnrichment:
+        """
+        Rebuild cached enrichments without re-validating them.
+        Only validated enrichments are cached, as their Python-mode model_dump(), so the
+        values already have the field types and validation would only repeat the work.
+        The list fields are copied, so changes to the returned enrichments never reach the cache entry.
+        """
+        return LLMEnrichment.model_construct(**{
+            field: list(value) if isinstance(value, list) else value
+            for field, value in cached.items()
+        })
+    
+    def _cache_key(self, note: Note) -> str:
+        """
+        Build the cache key for a note's enrichments.
+        
+        Content is lowercased and punctuation/whitespace runs are collapsed before hashing,
+        so trivially different notes share an entry. The model name and sampling temperature
+        are part of the key since they determine the response.
+        """
+        normalized = _NON_ALPHANUMERIC_RE.sub(" ", note.content.lower()).strip()
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"enrichment:{self.model.model_name}:{_GENERATION_CONFIG.temperature}:{digest}"
+    
+    async def _generate_uncached(self, note: Note) -> LLMEnrichment:
+        """
+        Generate enrichments with the Gemini API.
+        The first attempt fires PARALLEL_ATTEMPTS concurrent calls and keeps the first
+        valid response; if none validate, retries serially with error feedback.
+        """
         # Create the prompt for analysis
         prompt = self._create_analysis_prompt(note)
         
-        # Get the JSON schema for structured output
-        json_schema = self._get_json_schema()
+        try:
+            # Speculative first attempt
+            enrichments, last_error = await self._generate_speculative(prompt)
+            if enrichments is not None:
+                return enrichments
+            
+            for _attempt in range(MAX_ATTEMPTS - 1):
+                try:
+                    return await self._generate_attempt(prompt, last_error)
+                except ValidationError as e:
+                    last_error = str(e)
+                    # Continue to next attempt with error feedback
+                    continue
+                
+        except Exception as e:
+            # Non-validation errors should be raised immediately
+            raise Exception(f"Failed to generate enrichments: {e}")
+        
+        # If we reach here, all attempts failed with ValidationError
+        raise Exception(f"Failed to generate valid enrichments after {SINGLE_NOTE_CALLS} attempts. Last error: {last_error}")
+    
+    async def _generate_attempt(self, prompt: str, previous_error: Optional[str] = None) -> LLMEnrichment:
+        """Make a single structured call and validate the response."""
+        json_str = await self._call_gemini_api_structured(prompt, previous_error)
+        return self._parse_structured_response(json_str)
+    
+    async def _generate_speculative(self, prompt: str) -> Tuple[Optional[LLMEnrichment], Optional[str]]:
+        """
+        Run PARALLEL_ATTEMPTS concurrent attempts and return the first valid enrichment.
+        
+        Returns:
+            The first validated enrichment (or None) and the last validation error seen.
+            
+        Raises:
+            Exception: The first non-validation error raised by an attempt
+        """
+        pending = {asyncio.create_task(self._generate_attempt(prompt)) for _ in range(PARALLEL_ATTEMPTS)}
+        last_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Retrieve every finished result so no task exception goes unobserved
+                results = [(task, task.exception()) for task in done]
+                for task, error in results:
+                    if error is None:
+                        return task.result(), None
+                for _task, error in results:
+                    if not isinstance(error, ValidationError):
+                        raise error
+                    last_error = str(error)
+        finally:
+            for task in pending:
+                task.cancel()
+        return None, last_error
+    
+    async def _generate_batch_uncached(self, notes: List[Note]) -> List[LLMEnrichment]:
+        """Generate enrichments for notes with the Gemini API, chunking large batches."""
+        if len(notes) == 1:
+            # A batch of one is just a regular enrichment
+            return [await self._generate_uncached(notes[0])]
+        
+        semaphore = asyncio.Semaphore(MAX_BATCH_CONCURRENCY)
+        
+        async def generate_chunk(chunk: List[Note]) -> List[LLMEnrichment]:
+            async with semaphore:
+                return await self._generate_chunk(chunk)
+        
+        chunks = [notes[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(notes), BATCH_CHUNK_SIZE)]
+        chunk_results = await asyncio.gather(*(generate_chunk(chunk) for chunk in chunks))
+        return [enrichments for chunk_result in chunk_results for enrichments in chunk_result]
+    
+    async def _generate_chunk(self, notes: List[Note]) -> List[LLMEnrichment]:
+        """Generate enrichments for a chunk of notes in one structured call, with retry feedback."""
+        prompt = self._create_batch_analysis_prompt(notes)
         
         last_error = None
         
         for _attempt in range(MAX_ATTEMPTS):
             try:
-                # Generate response with structured output
-                json_str = await self._call_gemini_api_structured(prompt, json_schema, last_error)
-                
-                # Parse and validate the response
-                enrichments = self._parse_structured_response(json_str)
-                
-                return enrichments
+                json_str = await self._call_gemini_api_structured(
+                    prompt, last_error, _BATCH_STRUCTURED_SUFFIX, _BATCH_GENERATION_CONFIG
+                )
+                batch = self._parse_batch_response(json_str)
                 
             except ValidationError as e:
                 last_error = str(e)
@@ -55,71 +568,47 @@ class GeminiService(LLMServiceProtocol):
                 
             except Exception as e:
                 # Non-validation errors should be raised immediately
-                raise Exception(f"Failed to generate enrichments: {e}")
+                raise Exception(f"Failed to generate batch enrichments: {e}")
+            
+            # Results are matched to notes by their echoed index, never by array position
+            by_index = {item.index: item for item in batch}
+            if len(batch) == len(notes) and by_index.keys() == set(range(len(notes))):
+                return self._enrichments_from_batch([by_index[index] for index in range(len(notes))])
+            last_error = (
+                f"Expected a JSON array with {len(notes)} objects, one per note with each index from "
+                f"0 to {len(notes) - 1} exactly once, but got indexes {[item.index for item in batch]}"
+            )
         
-        # If we reach here, all attempts failed with ValidationError
-        raise Exception(f"Failed to generate valid enrichments after {MAX_ATTEMPTS} attempts. Last error: {last_error}")
+        # If we reach here, all attempts failed validation
+        raise BatchValidationError(f"Failed to generate valid batch enrichments after {MAX_ATTEMPTS} attempts. Last error: {last_error}")
+    
+    def _create_batch_analysis_prompt(self, notes: List[Note]) -> str:
+        """Create a prompt asking for the analysis of several notes at once."""
+        notes_json = orjson.dumps(
+            [{"index": index, "content": note.content} for index, note in enumerate(notes)],
+            option=orjson.OPT_INDENT_2
+        ).decode()
+        return _join_segments((_BATCH_PROMPT_PREFIX, notes_json, _BATCH_PROMPT_SUFFIX))
     
     def _create_analysis_prompt(self, note: Note) -> str:
         """Create a simple prompt for note analysis."""
-        return f"""
-You are an AI assistant that analyzes notes and generates enrichments. 
-
-Please analyze the following note content and provide insights for:
-- A concise summary (2-3 sentences)
-- Key topics and themes
-- Sentiment analysis (positive, negative, or neutral)
-- Important entities (people, places, concepts)
-- Relevant tags for categorization
-- Complexity assessment (0.0 to 1.0 scale)
-
-Note content:
-{note.content}
-
-Please provide your analysis in the requested structured format. 
-Note: Do not include enrichment_timestamp or llm_model fields - these will be set automatically.
-"""
+        return _join_segments((_PROMPT_PREFIX, note.content, _PROMPT_SUFFIX))
     
-    def _get_json_schema(self) -> Dict[str, Any]:
-        """Generate JSON schema from the LLMEnrichment Pydantic model."""
-        return LLMEnrichment.model_json_schema()
-    
-    async def _call_gemini_api_structured(self, prompt: str, json_schema: Dict[str, Any], previous_error: Optional[str] = None) -> str:
-        """Call the Gemini API with structured output using the JSON schema."""
+    async def _call_gemini_api_structured(
+        self,
+        prompt: str,
+        previous_error: Optional[str] = None,
+        structured_suffix: str = _STRUCTURED_SUFFIX,
+        generation_config: genai.types.GenerationConfig = _GENERATION_CONFIG
+    ) -> str:
+        """Call the Gemini API with structured output, using the single-note LLMEnrichment schema and settings by default."""
         try:
-            # Configure generation to use structured output
-            generation_config = genai.types.GenerationConfig(
-                temperature=0.1,  # Lower temperature for more consistent structured output
-                top_p=0.8,
-                top_k=40,
-                max_output_tokens=2048,
-            )
-            
             # Create the structured prompt with error feedback if available
             error_feedback = ""
             if previous_error:
-                error_feedback = f"""
-
-IMPORTANT: The previous attempt to generate a JSON response failed with this validation error:
-{previous_error}
-
-Please carefully review the schema requirements and ensure your response exactly matches the expected format. Pay special attention to:
-- Required fields that must be present
-- Correct data types for each field
-- Proper enum values where specified
-- Correct field names and structure
-
-"""
+                error_feedback = _join_segments((_ERROR_FEEDBACK_PREFIX, previous_error, _ERROR_FEEDBACK_SUFFIX))
             
-            structured_prompt = f"""
-{prompt}{error_feedback}
-
-Please respond with a JSON object that matches this exact schema:
-
-{json.dumps(json_schema, indent=2)}
-
-Return only the JSON object, no additional text or formatting.
-"""
+            structured_prompt = _join_segments(("\n", prompt, error_feedback, structured_suffix))
             
             # Call the Gemini API
             response = await self.model.generate_content_async(
@@ -141,36 +630,40 @@ Return only the JSON object, no additional text or formatting.
         """Parse the structured response and validate it against the LLMEnrichment model."""
         # Validate against Pydantic model
         enrichments = LLMEnrichment.model_validate_json(json_str)
-        enrichments.enrichment_timestamp = datetime.now(timezone.utc).isoformat()
-        enrichments.llm_model = self.model.model_name
+        self._stamp_enrichment(enrichments)
         
         return enrichments
+    
+    def _parse_batch_response(self, json_str: str) -> List[LLMBatchEnrichment]:
+        """Parse a batched response and validate it as a list of index-tagged LLMBatchEnrichment models."""
+        return _LLM_BATCH_ENRICHMENT_LIST_ADAPTER.validate_json(json_str)
+    
+    def _enrichments_from_batch(self, batch: List[LLMBatchEnrichment]) -> List[LLMEnrichment]:
+        """Strip the index from validated batch results and stamp them as enrichments."""
+        # The whole batch arrived in one response, so it shares a single clock reading
+        timestamp = datetime.now(timezone.utc)
+        enrichments_list = []
+        for item in batch:
+            # Already validated, so the remaining fields are rebuilt without validating again
+            enrichments = LLMEnrichment.model_construct(**item.model_dump(exclude={"index"}))
+            self._stamp_enrichment(enrichments, timestamp)
+            enrichments_list.append(enrichments)
+        
+        return enrichments_list
+    
+    def _stamp_enrichment(self, enrichments: LLMEnrichment, timestamp: Optional[datetime] = None) -> None:
+        """Set the fields the model is told not to generate, timestamping with now by default."""
+        enrichments.enrichment_timestamp = timestamp or datetime.now(timezone.utc)
+        enrichments.llm_model = self.model.model_name
             
     
     def _extract_json_from_response(self, response: str) -> str:
         """Extract JSON content from the LLM response, handling markdown formatting."""
-        import json
-        
-        # Remove markdown code blocks if present
-        if "```json" in response:
-            start = response.find("```json") + 7
-            end = response.find("```", start)
-            if end != -1:
-                json_content = response[start:end].strip()
-            else:
-                json_content = response[start:].strip()
-        elif "```" in response:
-            # Remove markdown code blocks without language specification
-            start = response.find("```") + 3
-            end = response.find("```", start)
-            if end != -1:
-                json_content = response[start:end].strip()
-            else:
-                json_content = response[start:].strip()
-        else:
-            # Return the response as-is if no markdown formatting
-            json_content = response.strip()
-
-        # Parse and re-serialize JSON to remove formatting whitespace
-        parsed_json = json.loads(json_content)
-        return json.dumps(parsed_json, separators=(',', ':'))
+        # Use the first markdown code block if present, otherwise the response as-is.
+        # Parsed once, when validated against the Pydantic model
+        match = _FENCE_RE.search(response)
+        if match is None:
+            return response.strip()
+        # The body is in the multi-line group or, for a single-line block, the other one
+        body = match.group(2) if match.group(2) is not None else match.group(3)
+        return body.strip()
@@ -0,0 +1,39 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from ..interfaces import CacheBackendProtocol
+
+# Default maximum number of cached entries
+DEFAULT_MAX_ENTRIES = 1024
+
+# Default time to live for cached entries, in seconds
+DEFAULT_TTL_SECONDS = 3600.0
+
+class InMemoryCacheBackend(CacheBackendProtocol):
+    """In-process LRU cache backend with per-entry expiry."""
+    
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, default_ttl: float = DEFAULT_TTL_SECONDS):
+        """Initialize an empty cache holding at most max_entries values."""
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value for key, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    async def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """Store value under key, evicting the least recently used entry when full."""
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
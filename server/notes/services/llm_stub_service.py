@@ -1,6 +1,44 @@
+import re
+from typing import AsyncIterator, Dict, FrozenSet, List, Set, Tuple
 from ..models import Note, LLMEnrichment, Sentiment
 from ..interfaces import LLMServiceProtocol
 
+# Lexicon words signalling each topic and suggested tag, in the order they are reported
+_TOPIC_WORDS: Dict[str, Tuple[str, ...]] = {
+    "meeting": ("meeting", "agenda"),
+    "task": ("todo", "task"),
+    "idea": ("idea", "concept"),
+    "project": ("project",),
+    "research": ("research",),
+}
+_TAG_WORDS: Dict[str, Tuple[str, ...]] = {
+    "priority": ("urgent", "important", "priority"),
+    "work": ("work", "job", "career"),
+    "personal": ("personal", "family", "home"),
+    "creative": ("idea", "inspiration", "creative"),
+}
+_POSITIVE_WORDS: FrozenSet[str] = frozenset({"good", "great", "excellent", "amazing", "wonderful", "love", "happy"})
+_NEGATIVE_WORDS: FrozenSet[str] = frozenset({"bad", "terrible", "awful", "hate", "sad", "angry", "frustrated"})
+
+# Sentiment indexed by (positive <= negative) + (positive == negative)
+_SENTIMENT_TABLE: Tuple[Sentiment, Sentiment, Sentiment] = (Sentiment.POSITIVE, Sentiment.NEGATIVE, Sentiment.NEUTRAL)
+
+_LEXICON: FrozenSet[str] = _POSITIVE_WORDS.union(
+    _NEGATIVE_WORDS,
+    *_TOPIC_WORDS.values(),
+    *_TAG_WORDS.values()
+)
+
+# Maximum number of entities reported per note
+_MAX_ENTITIES = 5
+
+# Matches every lexicon word and every @mention/#hashtag in a single pass over the content.
+# Mentions are matched by a zero-width lookahead so words inside them (e.g. "#work") still count.
+_LEXICON_RE = re.compile(
+    r"\b(?P<word>" + "|".join(sorted(_LEXICON)) + r")\b"
+    r"|(?<!\S)(?=(?P<mention>[@#]\S*))"
+)
+
 class LLMStubService(LLMServiceProtocol):
     """Stub service for simulating LLM interactions to generate note enrichments."""
     
@@ -15,14 +53,14 @@ class LLMStubService(LLMServiceProtocol):
         await asyncio.sleep(0.1)
         
         # Generate mock enrichments based on note content
-        content = note.content.lower()
+        words, mentions = self._scan_content(note.content.lower())
         
         enrichments = LLMEnrichment(
             summary=f"Note contains {len(note.content.split())} words",
-            topics=self._extract_topics(content),
-            sentiment=self._analyze_sentiment(content),
-            key_entities=self._extract_entities(content),
-            suggested_tags=self._generate_tags(content),
+            topics=self._extract_topics(words),
+            sentiment=self._analyze_sentiment(words),
+            key_entities=self._extract_entities(mentions),
+            suggested_tags=self._generate_tags(words),
             complexity_score=self._calculate_complexity(note.content),
             enrichment_timestamp=note.updated_at,
             llm_model="mock-llm-service"
@@ -30,73 +68,62 @@ class LLMStubService(LLMServiceProtocol):
         
         return enrichments
     
-    def _extract_topics(self, content: str) -> list:
-        """Extract potential topics from note content."""
-        topics = []
-        if "meeting" in content or "agenda" in content:
-            topics.append("meeting")
-        if "todo" in content or "task" in content:
-            topics.append("task")
-        if "idea" in content or "concept" in content:
-            topics.append("idea")
-        if "project" in content:
-            topics.append("project")
-        if "research" in content:
-            topics.append("research")
+    async def generate_enrichments_batch(self, notes: List[Note]) -> List[LLMEnrichment]:
+        """Generate enrichments for several notes, one at a time."""
+        return [await self.generate_enrichments(note) for note in notes]
+    
+    async def stream_enrichments(self, note: Note) -> AsyncIterator[bytes]:
+        """Generate the enrichments for a note and return them as a stream of a single JSON chunk."""
+        enrichments = await self.generate_enrichments(note)
+        return self._single_chunk(enrichments.model_dump_json().encode("utf-8"))
+    
+    async def _single_chunk(self, chunk: bytes) -> AsyncIterator[bytes]:
+        """Yield one prebuilt chunk."""
+        yield chunk
+    
+    def _scan_content(self, content: str) -> Tuple[Set[str], List[str]]:
+        """
+        Find the lexicon words and the mentions/hashtags in the note content.
+        Only the first _MAX_ENTITIES distinct mentions are kept, in order of appearance.
+        """
+        words = set()
+        mentions: Dict[str, None] = {}
+        for match in _LEXICON_RE.finditer(content):
+            if match.lastgroup == "word":
+                words.add(match.group("word"))
+            elif len(mentions) < _MAX_ENTITIES:
+                mentions[match.group("mention")] = None
+        return words, list(mentions)
+    
+    def _extract_topics(self, words: Set[str]) -> list:
+        """Extract potential topics from the lexicon words found in the note."""
+        topics = [topic for topic, topic_words in _TOPIC_WORDS.items() if not words.isdisjoint(topic_words)]
         return topics or ["general"]
     
-    def _analyze_sentiment(self, content: str) -> str:
-        """Analyze the sentiment of the note content."""
-        positive_words = ["good", "great", "excellent", "amazing", "wonderful", "love", "happy"]
-        negative_words = ["bad", "terrible", "awful", "hate", "sad", "angry", "frustrated"]
-        
-        positive_count = sum(1 for word in positive_words if word in content)
-        negative_count = sum(1 for word in negative_words if word in content)
+    def _analyze_sentiment(self, words: Set[str]) -> str:
+        """Analyze the sentiment of the lexicon words found in the note."""
+        positive_count = len(words & _POSITIVE_WORDS)
+        negative_count = len(words & _NEGATIVE_WORDS)
         
-        if positive_count > negative_count:
-            return Sentiment.POSITIVE
-        elif negative_count > positive_count:
-            return Sentiment.NEGATIVE
-        else:
-            return Sentiment.NEUTRAL
+        # Positive if it outweighs negative, negative if the reverse, neutral on a tie
+        return _SENTIMENT_TABLE[(positive_count <= negative_count) + (positive_count == negative_count)]
     
-    def _extract_entities(self, content: str) -> list:
-        """Extract potential entities from note content."""
-        entities = []
-        words = content.split()
-        
-        # Simple entity extraction (in real implementation, use NER)
-        for word in words:
-            if word[0].isupper() and len(word) > 2:
-                entities.append(word)
-            elif word.startswith("@") or word.startswith("#"):
-                entities.append(word)
-        
-        return list(set(entities))[:5]  # Limit to 5 entities
+    def _extract_entities(self, mentions: List[str]) -> list:
+        """Extract potential entities from the mentions and hashtags found in the note."""
+        # Simple entity extraction (in real implementation, use NER); already deduplicated and limited
+        return mentions
     
-    def _generate_tags(self, content: str) -> list:
-        """Generate suggested tags for the note."""
-        tags = []
-        words = content.split()
-        
-        # Generate tags based on content patterns
-        if any(word in content for word in ["urgent", "important", "priority"]):
-            tags.append("priority")
-        if any(word in content for word in ["work", "job", "career"]):
-            tags.append("work")
-        if any(word in content for word in ["personal", "family", "home"]):
-            tags.append("personal")
-        if any(word in content for word in ["idea", "inspiration", "creative"]):
-            tags.append("creative")
-        
-        return tags
+    def _generate_tags(self, words: Set[str]) -> list:
+        """Generate suggested tags from the lexicon words found in the note."""
+        return [tag for tag, tag_words in _TAG_WORDS.items() if not words.isdisjoint(tag_words)]
     
     def _calculate_complexity(self, content: str) -> float:
         """Calculate a simple complexity score for the note."""
         words = content.split()
-        sentences = content.split('.')
-        avg_word_length = sum(len(word) for word in words) / len(words) if words else 0
-        avg_sentence_length = len(words) / len(sentences) if sentences else 0
+        # Counting the separators avoids building the list of sentence strings
+        sentence_count = content.count('.') + 1
+        avg_word_length = sum(map(len, words)) / len(words) if words else 0
+        avg_sentence_length = len(words) / sentence_count
         
         # Simple complexity formula
         complexity = (avg_word_length * 0.3) + (avg_sentence_length * 0.1)
@@ -1,27 +1,25 @@
-from typing import List, Optional, Dict, Any
+import bisect
+from typing import AsyncIterator, List, Optional, Dict, Any
 from datetime import datetime, timezone
 from uuid import UUID
 from ..models import Note, NoteCreate, NoteUpdate, UnauthorizedAccessError
 from ..interfaces import LLMServiceProtocol
 
 class NotesService:
-    """Singleton Service class for managing notes operations."""
+    """
+    Service class for managing notes operations.
+    The application shares one instance, provided by notes.dependencies.get_notes_service.
+    """
     
-    _instance = None
-    _notes: Dict[UUID, Note] = {}
-    
-    def __new__(cls, llm_service: LLMServiceProtocol):
-        """Create a new singleton instance of the NotesService class."""
-        if cls._instance is None:
-            cls._instance = super(NotesService, cls).__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
+    __slots__ = ("llm_service", "_notes", "_note_ids_by_user")
     
     def __init__(self, llm_service: LLMServiceProtocol):
-        """Initialize the notes service with an LLM service."""
-        if not hasattr(self, '_initialized') or not self._initialized:
-            self.llm_service = llm_service
-            self._initialized = True
+        """Initialize the notes service with an LLM service and an empty note store."""
+        self.llm_service = llm_service
+        # Notes keyed by UUID.int: int hashing and equality run in C, while UUID's are Python-level
+        self._notes: Dict[int, Note] = {}
+        # Secondary index of note keys per user, in creation order, so user lookups don't scan or sort
+        self._note_ids_by_user: Dict[str, List[int]] = {}
     
     async def create_note(self, note_data: NoteCreate) -> Note:
         """Create and store a new note."""
@@ -30,21 +28,17 @@ class NotesService:
             user_id=note_data.user_id
         )
         
-        self._notes[note.id] = note
+        self._store_note(note)
         return note
     
     async def get_notes_by_user(self, user_id: str) -> List[Note]:
         """Retrieve all notes belonging to a specific user."""
-        user_notes = [
-            note for note in self._notes.values() 
-            if note.user_id == user_id
-        ]
-        # Sort by creation date, newest first
-        return sorted(user_notes, key=lambda x: x.created_at, reverse=True)
+        # The index is kept in creation order, so newest first is the reverse
+        return [self._notes[note_key] for note_key in reversed(self._note_ids_by_user.get(user_id, ()))]
     
     async def get_note_by_id(self, note_id: UUID, user_id: str) -> Optional[Note]:
         """Retrieve a single note by ID, ensuring it belongs to the user."""
-        note = self._notes.get(note_id)
+        note = self._notes.get(note_id.int)
         if not note:
             return None
         if note.user_id != user_id:
@@ -62,19 +56,54 @@ class NotesService:
         
         # Update the note's metadata with enrichments
         # Convert Pydantic model to dict for storage
+        # The stored note is updated in place; no need to store it again
         note.metadata.update(enrichments.model_dump())
         
-        # Update the stored note
-        self._notes[note_id] = note
-        
         return note
     
+    async def stream_note_enrichments(self, note_id: UUID, user_id: str) -> Optional[AsyncIterator[bytes]]:
+        """
+        Stream LLM-generated enrichments for a note, ensuring it belongs to the user.
+        Ownership is checked, and the LLM request made, before streaming starts; the note itself is not updated.
+        """
+        note = await self.get_note_by_id(note_id, user_id)
+        if not note:
+            return None
+        
+        return await self.llm_service.stream_enrichments(note)
+    
+    async def enrich_notes_batch(self, note_ids: List[UUID], user_id: str) -> List[Note]:
+        """
+        Update several notes with LLM-generated enrichments using a single batched LLM request.
+        Note IDs that don't exist are skipped.
+        """
+        notes = []
+        for note_id in note_ids:
+            note = await self.get_note_by_id(note_id, user_id)
+            if note:
+                notes.append(note)
+        if not notes:
+            return []
+        
+        # Generate enrichments for all notes at once using LLM service
+        enrichments = await self.llm_service.generate_enrichments_batch(notes)
+        
+        # Update each note's metadata with its enrichments
+        for note, note_enrichments in zip(notes, enrichments):
+            note.metadata.update(note_enrichments.model_dump())
+        
+        return notes
+    
     async def update_note_content(self, note_id: UUID, user_id: str, note_update: NoteUpdate) -> Optional[Note]:
         """Update a note's content and/or metadata."""
         note = await self.get_note_by_id(note_id, user_id)
         if not note:
             return None
         
+        # Nothing to do if the content is unchanged and there is no metadata to merge
+        if (note_update.content is None or note_update.content == note.content) and not note_update.metadata:
+            return note
+        
         content_changed = False
         
         # Update content if provided
@@ -90,23 +119,43 @@ class NotesService:
         if content_changed:
             note.updated_at = datetime.now(timezone.utc)
         
-        # Update the stored note
-        self._notes[note_id] = note
-        
+        # The stored note was updated in place; no need to store it again
         return note
     
     async def delete_note(self, note_id: UUID, user_id: str) -> bool:
         """Delete a note, ensuring it belongs to the user."""
         note = await self.get_note_by_id(note_id, user_id)
         if note:
-            del self._notes[note_id]
+            del self._notes[note_id.int]
+            user_note_ids = self._note_ids_by_user[note.user_id]
+            user_note_ids.remove(note_id.int)
+            if not user_note_ids:
+                # Users without notes are dropped, so the index holds exactly the users with notes
+                del self._note_ids_by_user[note.user_id]
             return True
         return False
     
+    def _store_note(self, note: Note) -> None:
+        """Store a new note and add it to the user index, keeping the index in creation order."""
+        note_key = note.id.int
+        self._notes[note_key] = note
+        note_keys = self._note_ids_by_user.setdefault(note.user_id, [])
+        if not note_keys or self._notes[note_keys[-1]].created_at <= note.created_at:
+            # New notes are created in time order, so this is the common case
+            note_keys.append(note_key)
+        else:
+            # Notes stored with an earlier creation date (e.g. backfilled) are inserted in place
+            bisect.insort(note_keys, note_key, key=lambda key: self._notes[key].created_at)
+    
+    def _clear_notes(self) -> None:
+        """Remove all stored notes."""
+        self._notes.clear()
+        self._note_ids_by_user.clear()
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the notes service."""
         total_notes = len(self._notes)
-        unique_users = len(set(note.user_id for note in self._notes.values()))
+        unique_users = len(self._note_ids_by_user)
         
         return {
             "total_notes": total_notes,
@@ -0,0 +1,90 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock, AsyncMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ..router import router
+from ..interfaces import LLMServiceProtocol
+from .sample_data import ENRICHMENT_JSON, ENRICHMENT
+from middleware.exception_handler import ExceptionHandlerMiddleware
+
+# Response returned by the mock Gemini model unless a test overrides it
+_DEFAULT_GEMINI_RESPONSE = SimpleNamespace(text=ENRICHMENT_JSON)
+
+
+def _create_app() -> FastAPI:
+    """Create a FastAPI app with the notes router for testing."""
+    app = FastAPI(
+        title="NoteApp FastAPI Test",
+        description="Test FastAPI application for notes router",
+        version="1.0.0"
+    )
+    app.include_router(router)
+    return app
+
+
+@pytest.fixture(scope="session")
+def app():
+    """Create a FastAPI app with the notes router, shared by all tests."""
+    return _create_app()
+
+
+@pytest.fixture(scope="session")
+def app_with_exception_handler():
+    """Create a FastAPI app with the notes router and the real app's exception handling middleware."""
+    app = _create_app()
+    app.add_middleware(ExceptionHandlerMiddleware)
+    return app
+
+
+@pytest.fixture(scope="session")
+def base_client(app):
+    """Create a test client for the shared app, started once for the whole session."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def base_client_with_exception_handler(app_with_exception_handler):
+    """Create a test client for the shared app with exception handling, started once for the whole session."""
+    with TestClient(app_with_exception_handler) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def mock_gemini_model():
+    """Create a mock Gemini model with all required methods, shared by all tests."""
+    mock_model = Mock()
+    mock_model.model_name = "gemini-2.5-flash"
+    # Like a real model before its first async call, no gRPC client has been opened
+    mock_model._async_client = None
+    
+    # Mock the generate_content_async method that GeminiService calls
+    mock_model.generate_content_async = AsyncMock(return_value=_DEFAULT_GEMINI_RESPONSE)
+    
+    return mock_model
+
+
+@pytest.fixture(autouse=True)
+def _reset_gemini(mock_gemini_model):
+    """Undo any per-test customization of the shared mock Gemini model."""
+    yield
+    mock_gemini_model.generate_content_async.reset_mock(return_value=True, side_effect=True)
+    mock_gemini_model.generate_content_async.return_value = _DEFAULT_GEMINI_RESPONSE
+
+
+@pytest.fixture(scope="session")
+def mock_llm_service():
+    """Create a mock LLM service conforming to LLMServiceProtocol, shared by all tests."""
+    mock_service = AsyncMock(spec=LLMServiceProtocol)
+    mock_service.generate_enrichments.return_value = ENRICHMENT
+    return mock_service
+
+
+@pytest.fixture(autouse=True)
+def _reset_llm_service(mock_llm_service):
+    """Undo any per-test customization of the shared mock LLM service."""
+    yield
+    mock_llm_service.reset_mock(return_value=True, side_effect=True)
+    mock_llm_service.generate_enrichments.return_value = ENRICHMENT
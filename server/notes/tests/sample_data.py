@@ -0,0 +1,7 @@
+from ..models import LLMEnrichment
+
+# A valid structured Gemini response for a single note
+ENRICHMENT_JSON = '{"summary": "Test summary", "topics": ["test"], "sentiment": "positive", "key_entities": ["test"], "suggested_tags": ["test"], "complexity_score": 0.7}'
+
+# The same enrichments, parsed once, as returned by the mock LLM service
+ENRICHMENT = LLMEnrichment.model_validate_json(ENRICHMENT_JSON).model_copy(update={"llm_model": "mock-llm-service"})
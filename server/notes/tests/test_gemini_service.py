@@ -0,0 +1,447 @@
+import pytest
+import pytest_asyncio
+import asyncio
+import json
+from typing import List, Optional
+from types import SimpleNamespace
+from unittest.mock import Mock, AsyncMock
+
+from google.generativeai import client as genai_client
+
+from ..models import Note, Sentiment
+from ..dependencies import _get_gemini_api_key, _get_notes_service, close_services
+from ..services.gemini_service import (
+    GeminiService, BATCH_CHUNK_SIZE, MAX_ATTEMPTS, MAX_OUTPUT_TOKENS_PER_NOTE, PARALLEL_ATTEMPTS,
+    SINGLE_NOTE_CALLS, STREAM_FLUSH_BYTES
+)
+from ..services.in_memory_cache_backend import InMemoryCacheBackend
+from .sample_data import ENRICHMENT_JSON
+
+# A response that fails LLMEnrichment validation (missing required fields)
+_INVALID_JSON = '{"summary": "Test summary"}'
+
+# The single-note response, parsed once, as the template for batched responses
+_ENRICHMENT_FIELDS = json.loads(ENRICHMENT_JSON)
+
+
+def batch_json(count: int, indexes: Optional[List[int]] = None) -> str:
+    """Build a valid structured response for a batch of notes, with summaries numbered by note index."""
+    return json.dumps([
+        {**_ENRICHMENT_FIELDS, "index": index, "summary": f"Summary {index}"}
+        for index in (range(count) if indexes is None else indexes)
+    ])
+
+
+class TestGeminiService:
+    """Unit tests for GeminiService against a mocked Gemini model."""
+
+    @pytest_asyncio.fixture
+    async def gemini_service(self, mock_gemini_model):
+        """Create a GeminiService with the mocked model and no cache, closed after the test."""
+        service = GeminiService(gemini_model=mock_gemini_model)
+        yield service
+        await service.aclose()
+
+    @pytest.fixture
+    def note(self):
+        """A note to enrich."""
+        return Note(content="Test note content for integration testing", user_id="test_user_123")
+
+    class TestGenerateEnrichments:
+        """Test single-note enrichment."""
+
+        @pytest.mark.asyncio
+        async def test_generate_enrichments_success(self, gemini_service, note):
+            """Test that a valid response is parsed and stamped."""
+            enrichments = await gemini_service.generate_enrichments(note)
+
+            assert enrichments.summary == "Test summary"
+            assert enrichments.sentiment == Sentiment.POSITIVE
+            assert enrichments.llm_model == "gemini-2.5-flash"
+            assert enrichments.enrichment_timestamp is not None
+
+        @pytest.mark.asyncio
+        @pytest.mark.parametrize("response_text", [
+            f"```json\n{ENRICHMENT_JSON}\n```",
+            f"Here you go:\n```\n{ENRICHMENT_JSON}\n```\nThanks",
+            f"~~~json\n{ENRICHMENT_JSON}\n~~~",
+            f"```json\n{ENRICHMENT_JSON}",  # Unclosed code block
+            f"  {ENRICHMENT_JSON}  ",
+            f"```json\n{ENRICHMENT_JSON}```",  # Closing fence on the JSON's line
+            f"```json\r\n{ENRICHMENT_JSON}\r\n```\r\n",
+            f"Here: ```json\n{ENRICHMENT_JSON}\n```",
+            f"```json {ENRICHMENT_JSON}```",
+        ], ids=[
+            "json-fence", "fence-with-text", "tilde-fence", "unclosed-fence", "plain",
+            "closing-fence-same-line", "crlf", "text-before-fence", "single-line",
+        ])
+        async def test_generate_enrichments_markdown_response(self, gemini_service, note, mock_gemini_model, response_text):
+            """Test that JSON wrapped in markdown formatting is extracted."""
+            mock_gemini_model.generate_content_async.return_value = SimpleNamespace(text=response_text)
+
+            enrichments = await gemini_service.generate_enrichments(note)
+
+            assert enrichments.summary == "Test summary"
+
+        @pytest.mark.asyncio
+        @pytest.mark.parametrize("fence", ["```", "~~~"], ids=["backticks", "tildes"])
+        @pytest.mark.parametrize("wrapped", [False, True], ids=["plain", "fenced"])
+        async def test_generate_enrichments_fence_inside_string(self, gemini_service, note, mock_gemini_model, fence, wrapped):
+            """Test that fence characters inside a JSON string value are not taken for a code block."""
+            summary = f"Use ~~~ or ``` to fence code, e.g. {fence}json"
+            response_json = json.dumps({**_ENRICHMENT_FIELDS, "summary": summary})
+            response_text = f"{fence}json\n{response_json}\n{fence}" if wrapped else response_json
+            mock_gemini_model.generate_content_async.return_value = SimpleNamespace(text=response_text)
+
+            enrichments = await gemini_service.generate_enrichments(note)
+
+            assert enrichments.summary == summary
+
+        @pytest.mark.asyncio
+        async def test_generate_enrichments_retries_with_feedback(self, gemini_service, note, mock_gemini_model):
+            """Test that invalid responses are retried with the validation error in the prompt."""
+            mock_gemini_model.generate_content_async.side_effect = [
+                SimpleNamespace(text=_INVALID_JSON),
+                SimpleNamespace(text=_INVALID_JSON),
+                SimpleNamespace(text=ENRICHMENT_JSON),
+            ]
+
+            enrichments = await gemini_service.generate_enrichments(note)
+
+            assert enrichments.summary == "Test summary"
+            retry_prompt = mock_gemini_model.generate_content_async.call_args.args[0]
+            assert "previous attempt to generate a JSON response failed" in retry_prompt
+
+        @pytest.mark.asyncio
+        async def test_generate_enrichments_invalid_after_max_attempts(self, gemini_service, note, mock_gemini_model):
+            """Test that enrichment fails once every attempt returns invalid JSON."""
+            mock_gemini_model.generate_content_async.return_value = SimpleNamespace(text=_INVALID_JSON)
+
+            with pytest.raises(Exception, match=f"after {SINGLE_NOTE_CALLS} attempts"):
+                await gemini_service.generate_enrichments(note)
+            assert mock_gemini_model.generate_content_async.call_count == SINGLE_NOTE_CALLS
+
+        @pytest.mark.asyncio
+        async def test_generate_enrichments_api_error(self, gemini_service, note, mock_gemini_model):
+            """Test that API errors are raised without retrying."""
+            mock_gemini_model.generate_content_async.side_effect = Exception("Gemini API error")
+
+            with pytest.raises(Exception, match="Gemini API error"):
+                await gemini_service.generate_enrichments(note)
+
+    class TestSpeculativeAttempts:
+        """Test the concurrent speculative first attempt."""
+
+        @pytest.mark.asyncio
+        async def test_first_valid_response_wins(self, gemini_service, note, mock_gemini_model):
+            """Test that the first valid response is returned and the slower call is cancelled."""
+            slow_call_cancelled = asyncio.Event()
+
+            async def generate_content(*args, **kwargs):
+                if mock_gemini_model.generate_content_async.call_count == 1:
+                    try:
+                        await asyncio.sleep(10)
+                    except asyncio.CancelledError:
+                        slow_call_cancelled.set()
+                        raise
+                return SimpleNamespace(text=ENRICHMENT_JSON)
+            mock_gemini_model.generate_content_async.side_effect = generate_content
+
+            enrichments = await gemini_service.generate_enrichments(note)
+            await asyncio.wait_for(slow_call_cancelled.wait(), timeout=1)
+
+            assert enrichments.summary == "Test summary"
+            assert mock_gemini_model.generate_content_async.call_count == PARALLEL_ATTEMPTS
+
+        @pytest.mark.asyncio
+        async def test_valid_response_preferred_over_invalid(self, gemini_service, note, mock_gemini_model):
+            """Test that a single invalid speculative response does not trigger a retry."""
+            mock_gemini_model.generate_content_async.side_effect = [
+                SimpleNamespace(text=_INVALID_JSON),
+                SimpleNamespace(text=ENRICHMENT_JSON),
+            ]
+
+            enrichments = await gemini_service.generate_enrichments(note)
+
+            assert enrichments.summary == "Test summary"
+            assert mock_gemini_model.generate_content_async.call_count == PARALLEL_ATTEMPTS
+
+        @pytest.mark.asyncio
+        async def test_api_error_raised_without_retry(self, gemini_service, note, mock_gemini_model):
+            """Test that an API error on a speculative call is raised instead of retrying."""
+            mock_gemini_model.generate_content_async.side_effect = [
+                SimpleNamespace(text=_INVALID_JSON),
+                Exception("Gemini API error"),
+            ]
+
+            with pytest.raises(Exception, match="Gemini API error"):
+                await gemini_service.generate_enrichments(note)
+            assert mock_gemini_model.generate_content_async.call_count == PARALLEL_ATTEMPTS
+
+    class TestCaching:
+        """Test enrichment caching."""
+
+        @pytest_asyncio.fixture
+        async def gemini_service(self, mock_gemini_model):
+            """Create a GeminiService with the mocked model and an in-memory cache, closed after the test."""
+            service = GeminiService(gemini_model=mock_gemini_model, cache_backend=InMemoryCacheBackend())
+            yield service
+            await service.aclose()
+
+        @pytest.mark.asyncio
+        async def test_cache_hit_for_normalized_content(self, gemini_service, mock_gemini_model, note):
+            """Test that content differing only in case and punctuation is served from the cache."""
+            await gemini_service.generate_enrichments(note)
+            call_count = mock_gemini_model.generate_content_async.call_count
+
+            similar_note = Note(content="TEST note content, for integration testing!", user_id="other_user")
+            enrichments = await gemini_service.generate_enrichments(similar_note)
+
+            assert enrichments.summary == "Test summary"
+            assert mock_gemini_model.generate_content_async.call_count == call_count
+
+        @pytest.mark.asyncio
+        async def test_batch_serves_cached_notes_and_generates_the_rest(self, gemini_service, mock_gemini_model, note):
+            """Test that a batch only sends uncached notes to Gemini, caches them, and keeps note order."""
+            await gemini_service.generate_enrichments(note)
+            notes = [
+                Note(content="First new note", user_id="test_user"),
+                note,
+                Note(content="Second new note", user_id="test_user"),
+            ]
+            mock_gemini_model.generate_content_async.reset_mock()
+            mock_gemini_model.generate_content_async.return_value = SimpleNamespace(text=batch_json(2))
+
+            results = await gemini_service.generate_enrichments_batch(notes)
+            cached_results = await gemini_service.generate_enrichments_batch(notes)
+
+            assert [enrichments.summary for enrichments in results] == ["Summary 0", "Test summary", "Summary 1"]
+            assert [enrichments.summary for enrichments in cached_results] == ["Summary 0", "Test summary", "Summary 1"]
+            assert mock_gemini_model.generate_content_async.call_count == 1
+            batch_prompt = mock_gemini_model.generate_content_async.call_args.args[0]
+            assert note.content not in batch_prompt
+
+        @pytest.mark.asyncio
+        async def test_cache_hit_returns_independent_copy(self, gemini_service, note):
+            """Test that changing enrichments served from the cache does not change the cached entry."""
+            await gemini_service.generate_enrichments(note)
+
+            first_hit = await gemini_service.generate_enrichments(note)
+            topics = list(first_hit.topics)
+            first_hit.topics.append("changed")
+            first_hit.key_entities.clear()
+            second_hit = await gemini_service.generate_enrichments(note)
+
+            assert second_hit.topics == topics
+            assert second_hit.key_entities
+
+    class TestBatchEnrichments:
+        """Test batched and coalesced enrichment."""
+
+        @pytest.mark.asyncio
+        async def test_generate_enrichments_batch(self, gemini_service, mock_gemini_model):
+            """Test that several notes are enriched with a single call, in order."""
+            notes = [Note(content=f"Note {index}", user_id="test_user") for index in range(3)]
+            mock_gemini_model.generate_content_async.return_value = SimpleNamespace(text=batch_json(3))
+
+            results = await gemini_service.generate_enrichments_batch(notes)
+
+            assert [enrichments.summary for enrichments in results] == ["Summary 0", "Summary 1", "Summary 2"]
+            assert mock_gemini_model.generate_content_async.call_count == 1
+            generation_config = mock_gemini_model.generate_content_async.call_args.kwargs["generation_config"]
+            assert generation_config.max_output_tokens == MAX_OUTPUT_TOKENS_PER_NOTE * BATCH_CHUNK_SIZE
+
+        @pytest.mark.asyncio
+        async def test_generate_enrichments_batch_chunked(self, gemini_service, mock_gemini_model):
+            """Test that batches larger than BATCH_CHUNK_SIZE are split into several calls, keeping note order."""
+            notes = [Note(content=f"Note {index}", user_id="test_user") for index in range(BATCH_CHUNK_SIZE + 2)]
+
+            async def generate_content(prompt, **kwargs):
+                # Each note in the prompt is a JSON object with its content
+                return SimpleNamespace(text=batch_json(prompt.count('"content":')))
+            mock_gemini_model.generate_content_async.side_effect = generate_content
+
+            results = await gemini_service.generate_enrichments_batch(notes)
+
+            expected = [f"Summary {index}" for index in range(BATCH_CHUNK_SIZE)] + ["Summary 0", "Summary 1"]
+            assert [enrichments.summary for enrichments in results] == expected
+            assert mock_gemini_model.generate_content_async.call_count == 2
+
+        @pytest.mark.asyncio
+        async def test_generate_enrichments_batch_matched_by_index(self, gemini_service, mock_gemini_model):
+            """Test that reordered batch results are matched back to their notes by index."""
+            notes = [Note(content=f"Note {index}", user_id="test_user") for index in range(3)]
+            mock_gemini_model.generate_content_async.return_value = SimpleNamespace(text=batch_json(3, indexes=[2, 0, 1]))
+
+            results = await gemini_service.generate_enrichments_batch(notes)
+
+            assert [enrichments.summary for enrichments in results] == ["Summary 0", "Summary 1", "Summary 2"]
+            assert all(not hasattr(enrichments, "index") for enrichments in results)
+
+        @pytest.mark.asyncio
+        async def test_generate_enrichments_batch_duplicate_index(self, gemini_service, mock_gemini_model):
+            """Test that a batch response with a repeated index is retried with feedback, then fails."""
+            notes = [Note(content=f"Note {index}", user_id="test_user") for index in range(3)]
+            mock_gemini_model.generate_content_async.return_value = SimpleNamespace(text=batch_json(3, indexes=[0, 1, 1]))
+
+            with pytest.raises(Exception, match=r"each index from 0 to 2 exactly once, but got indexes \[0, 1, 1\]"):
+                await gemini_service.generate_enrichments_batch(notes)
+            assert mock_gemini_model.generate_content_async.call_count == MAX_ATTEMPTS
+
+        @pytest.mark.asyncio
+        async def test_generate_enrichments_batch_wrong_length(self, gemini_service, mock_gemini_model):
+            """Test that a batch response with the wrong number of results is retried, then fails."""
+            notes = [Note(content=f"Note {index}", user_id="test_user") for index in range(3)]
+            mock_gemini_model.generate_content_async.return_value = SimpleNamespace(text=batch_json(2))
+
+            with pytest.raises(Exception, match="Expected a JSON array with 3 objects"):
+                await gemini_service.generate_enrichments_batch(notes)
+            assert mock_gemini_model.generate_content_async.call_count == MAX_ATTEMPTS
+
+        @pytest.mark.asyncio
+        async def test_concurrent_requests_coalesced(self, gemini_service, mock_gemini_model):
+            """Test that concurrent single-note requests are sent as one batch."""
+            notes = [Note(content=f"Note {index}", user_id="test_user") for index in range(2)]
+            mock_gemini_model.generate_content_async.return_value = SimpleNamespace(text=batch_json(2))
+
+            results = await asyncio.gather(*(gemini_service.generate_enrichments(note) for note in notes))
+
+            assert [enrichments.summary for enrichments in results] == ["Summary 0", "Summary 1"]
+            assert mock_gemini_model.generate_content_async.call_count == 1
+
+        @pytest.mark.asyncio
+        async def test_concurrent_requests_coalesced_per_user(self, gemini_service, mock_gemini_model):
+            """Test that concurrent requests from different users are never sent in the same prompt."""
+            notes = [
+                Note(content="Alice note 0", user_id="alice"),
+                Note(content="Bob note", user_id="bob"),
+                Note(content="Alice note 1", user_id="alice"),
+            ]
+
+            async def generate_content(prompt, **kwargs):
+                return SimpleNamespace(text=batch_json(2) if "JSON array" in prompt else ENRICHMENT_JSON)
+            mock_gemini_model.generate_content_async.side_effect = generate_content
+
+            results = await asyncio.gather(*(gemini_service.generate_enrichments(note) for note in notes))
+
+            assert [enrichments.summary for enrichments in results] == ["Summary 0", "Test summary", "Summary 1"]
+            for call in mock_gemini_model.generate_content_async.call_args_list:
+                prompt = call.args[0]
+                assert not ("Alice note" in prompt and "Bob note" in prompt)
+
+        @pytest.mark.asyncio
+        async def test_failed_batch_falls_back_per_note(self, gemini_service, mock_gemini_model):
+            """Test that a batch with invalid output is retried note by note, failing only the note that still fails."""
+            notes = [Note(content=f"Note {index}", user_id="test_user") for index in range(3)]
+
+            async def generate_content(prompt, **kwargs):
+                if "JSON array" in prompt:
+                    # A truncated batch response
+                    return SimpleNamespace(text=batch_json(3)[:-20])
+                if "Note 1" in prompt:
+                    raise Exception("Bad note")
+                return SimpleNamespace(text=ENRICHMENT_JSON)
+            mock_gemini_model.generate_content_async.side_effect = generate_content
+
+            results = await asyncio.gather(
+                *(gemini_service.generate_enrichments(note) for note in notes),
+                return_exceptions=True
+            )
+
+            assert results[0].summary == "Test summary"
+            assert isinstance(results[1], Exception) and "Bad note" in str(results[1])
+            assert results[2].summary == "Test summary"
+
+        @pytest.mark.asyncio
+        async def test_failed_batch_api_error_not_retried_per_note(self, gemini_service, mock_gemini_model):
+            """Test that an API error on a batch fails every request with a single call, without per-note retries."""
+            notes = [Note(content=f"Note {index}", user_id="test_user") for index in range(BATCH_CHUNK_SIZE)]
+            mock_gemini_model.generate_content_async.side_effect = Exception("Rate limited")
+
+            results = await asyncio.gather(
+                *(gemini_service.generate_enrichments(note) for note in notes),
+                return_exceptions=True
+            )
+
+            assert all(isinstance(result, Exception) and "Rate limited" in str(result) for result in results)
+            assert mock_gemini_model.generate_content_async.call_count == 1
+
+    class TestStreamEnrichments:
+        """Test streamed enrichment."""
+
+        @pytest.mark.asyncio
+        async def test_stream_enrichments_batches_chunks(self, gemini_service, note, mock_gemini_model):
+            """Test that small response chunks are buffered into larger ones."""
+            async def stream():
+                for index in range(0, len(ENRICHMENT_JSON), 8):
+                    yield SimpleNamespace(text=ENRICHMENT_JSON[index:index + 8])
+            mock_gemini_model.generate_content_async.return_value = stream()
+
+            chunks = [chunk async for chunk in await gemini_service.stream_enrichments(note)]
+
+            assert b"".join(chunks).decode() == ENRICHMENT_JSON
+            assert all(len(chunk) >= STREAM_FLUSH_BYTES for chunk in chunks[:-1])
+            assert mock_gemini_model.generate_content_async.call_args.kwargs["stream"] is True
+
+        @pytest.mark.asyncio
+        async def test_stream_enrichments_error_before_streaming(self, gemini_service, note, mock_gemini_model):
+            """Test that an error on the first read is raised when starting the stream, not while iterating it."""
+            async def stream():
+                raise Exception("Gemini API error")
+                yield
+            mock_gemini_model.generate_content_async.return_value = stream()
+
+            with pytest.raises(Exception, match="Gemini API error"):
+                await gemini_service.stream_enrichments(note)
+
+    class TestClose:
+        """Test releasing the service's resources."""
+
+        @pytest.mark.asyncio
+        async def test_aclose_closes_async_client(self, note, monkeypatch):
+            """Test that aclose stops the coalescer, closes the model's gRPC transport and drops the SDK's cached client."""
+            mock_model = Mock()
+            mock_model.model_name = "gemini-2.5-flash"
+            mock_model.generate_content_async = AsyncMock(return_value=SimpleNamespace(text=ENRICHMENT_JSON))
+            async_client = mock_model._async_client
+            async_client.transport.close = AsyncMock()
+            monkeypatch.setitem(genai_client._client_manager.clients, "generative_async", async_client)
+            gemini_service = GeminiService(gemini_model=mock_model)
+            await gemini_service.generate_enrichments(note)
+
+            await gemini_service.aclose()
+
+            async_client.transport.close.assert_awaited_once()
+            assert mock_model._async_client is None
+            assert "generative_async" not in genai_client._client_manager.clients
+
+        @pytest.mark.asyncio
+        async def test_aclose_cancels_in_flight_batches(self, mock_gemini_model):
+            """Test that aclose cancels dispatched batches and the requests waiting on them."""
+            call_started = asyncio.Event()
+
+            async def generate_content(*args, **kwargs):
+                call_started.set()
+                await asyncio.sleep(10)
+            mock_gemini_model.generate_content_async.side_effect = generate_content
+            gemini_service = GeminiService(gemini_model=mock_gemini_model)
+            notes = [Note(content=f"Note {index}", user_id="test_user") for index in range(2)]
+            requests = [asyncio.create_task(gemini_service.generate_enrichments(note)) for note in notes]
+            await asyncio.wait_for(call_started.wait(), timeout=1)
+
+            await gemini_service.aclose()
+
+            results = await asyncio.gather(*requests, return_exceptions=True)
+            assert all(isinstance(result, asyncio.CancelledError) for result in results)
+
+        @pytest.mark.asyncio
+        async def test_close_services_drops_shared_services(self, monkeypatch):
+            """Test that close_services clears the providers, so the next lifespan gets fresh services."""
+            monkeypatch.setenv("GEMINI_API_KEY", "test-api-key")
+            notes_service = _get_notes_service()
+
+            await close_services()
+
+            assert _get_notes_service() is not notes_service
+            await close_services()
+            _get_gemini_api_key.cache_clear()
@@ -1,75 +1,92 @@
 import pytest
-import asyncio
-from unittest.mock import Mock, AsyncMock
-from fastapi.testclient import TestClient
-from fastapi import FastAPI
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from uuid import uuid4
+from itertools import count
+from uuid import UUID
 
-from ..router import router
 from ..dependencies import get_notes_service
-from ..models import Note
+from ..models import Note, UnauthorizedAccessError
 from ..services.notes_service import NotesService
+from .sample_data import ENRICHMENT
+
+# Fixed timestamp for notes built directly in tests
+_NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# Deterministic note IDs: one that is never stored, and a counter for unique ones
+_MISSING_ID = UUID(int=0xDEADBEEF)
+_ids = count(1)
+
+# Long (1000 character) note content, built once for the parametrized cases
+_LONG = "A" * 1000
+
+# (content, update) scenarios for the lifecycle test, covering varied content and update shapes;
+# labelled by LIFECYCLE_IDS rather than by their (long) values
+LIFECYCLE_CASES = [
+    # Simple note, content update
+    ("Simple test note", {"content": "Updated content"}),
+    # Empty content (should still work), metadata-only update
+    ("", {"metadata": {"custom_key": "custom_value"}}),
+    # Very long content, content and nested metadata update
+    (
+        _LONG,
+        {
+            "content": "Updated content and metadata",
+            "metadata": {"key": "value", "nested": {"deep": "value"}}
+        }
+    ),
+    # Content with special characters, empty content update
+    ("Note with @#$%^&*() chars", {"content": ""}),
+    # Content with unicode, very long content update
+    ("Note with unicode: café résumé 🚀", {"content": _LONG}),
+]
+LIFECYCLE_IDS = ["simple", "empty", "long", "special", "unicode"]
+
+
+def make_note(content: str, user_id: str, created_at: datetime = _NOW) -> Note:
+    """Build a note to store directly, skipping validation since the fields are known to be valid."""
+    return Note.model_construct(
+        id=UUID(int=next(_ids)),
+        content=content,
+        user_id=user_id,
+        created_at=created_at,
+        updated_at=created_at,
+        metadata={}
+    )
 
 
 class TestNotesRouterIntegration:
     """Integration tests for the notes router endpoints."""
 
-    @pytest.fixture
-    def app(self):
-        """Create a FastAPI app with the notes router for testing."""
-        app = FastAPI(
-            title="NoteApp FastAPI Test",
-            description="Test FastAPI application for notes router",
-            version="1.0.0"
-        )
-        
-        # Add the same middleware as the real app
-        from middleware.exception_handler import ExceptionHandlerMiddleware
-        app.add_middleware(ExceptionHandlerMiddleware)
-        
-        app.include_router(router)
-        return app
+    @pytest.fixture(scope="module")
+    def notes_service(self, mock_llm_service):
+        """Create a NotesService instance with a mocked LLM service, shared by the module."""
+        # GeminiService itself is covered by test_gemini_service.py
+        return NotesService(mock_llm_service)
 
-    @pytest.fixture
-    def mock_gemini_model(self):
-        """Create a mock Gemini model with all required methods."""
-        mock_model = Mock()
-        mock_model.model_name = "gemini-2.5-flash"
-        
-        # Mock the generate_content_async method that GeminiService calls
-        mock_response = Mock()
-        mock_response.text = '{"summary": "Test summary", "topics": ["test"], "sentiment": "positive", "key_entities": ["test"], "suggested_tags": ["test"], "complexity_score": 0.7}'
-        mock_model.generate_content_async = AsyncMock(return_value=mock_response)
-        
-        return mock_model
+    @pytest.fixture(autouse=True)
+    def _clean_notes(self, notes_service):
+        """Clear notes for clean test state."""
+        notes_service._clear_notes()
 
     @pytest.fixture
-    def notes_service(self, mock_gemini_model):
-        """Create a NotesService instance with real GeminiService and mocked model."""
-        # Clear any existing singleton instance
-        NotesService._instance = None
+    def client(self, app, base_client, notes_service):
+        """Provide the shared test client with mocked dependencies."""
+        # Override the dependencies
+        app.dependency_overrides[get_notes_service] = lambda: notes_service
         
-        # Create a real GeminiService with mocked model
-        from ..services.gemini_service import GeminiService
-        gemini_service = GeminiService(gemini_model=mock_gemini_model)
+        yield base_client
         
-        service = NotesService(gemini_service)
-        # Clear notes for clean test state
-        service._notes.clear()
-        return service
+        # Clean up, so the override doesn't leak into the shared app
+        app.dependency_overrides.pop(get_notes_service, None)
 
     @pytest.fixture
-    def client(self, app, notes_service):
-        """Create a test client with mocked dependencies."""
-        # Override the dependencies
-        app.dependency_overrides[get_notes_service] = lambda: notes_service
+    def error_client(self, app_with_exception_handler, base_client_with_exception_handler, notes_service):
+        """Provide the shared test client for the app with exception handling, with mocked dependencies."""
+        app_with_exception_handler.dependency_overrides[get_notes_service] = lambda: notes_service
         
-        with TestClient(app) as test_client:
-            yield test_client
+        yield base_client_with_exception_handler
         
-        # Clean up
-        app.dependency_overrides.clear()
+        app_with_exception_handler.dependency_overrides.pop(get_notes_service, None)
 
     @pytest.fixture
     def sample_note_data(self):
@@ -82,74 +99,30 @@ class TestNotesRouterIntegration:
     @pytest.fixture
     def sample_note(self, sample_note_data, notes_service):
         """Create and store a sample note for testing."""
-        note = Note(
-            id=uuid4(),
-            content=sample_note_data["content"],
-            user_id=sample_note_data["user_id"],
-            created_at=datetime.now(timezone.utc),
-            updated_at=datetime.now(timezone.utc),
-            metadata={}
-        )
-        notes_service._notes[note.id] = note
+        note = make_note(sample_note_data["content"], sample_note_data["user_id"])
+        notes_service._store_note(note)
         return note
 
+    @pytest.fixture(scope="module")
+    def seeded_notes(self):
+        """Additional notes, built once per module: one more for the sample user and one for another user."""
+        return [
+            make_note("Second test note", "test_user_123"),
+            make_note("Other user's note", "other_user"),
+        ]
+
+    @pytest.fixture
+    def seeded(self, seeded_notes, sample_note, notes_service):
+        """Store the sample note and the seeded notes for read-only tests."""
+        for note in seeded_notes:
+            notes_service._store_note(note)
+        return [sample_note, *seeded_notes]
+
 
 
     class TestCreateNote:
         """Test POST /notes endpoint."""
 
-        @pytest.mark.parametrize("note_data,expected_status,expected_response", [
-            # Valid note creation
-            (
-                {"content": "Simple test note", "user_id": "user123"},
-                201,
-                {"content": "Simple test note", "user_id": "user123"}
-            ),
-            # Empty content (should still work)
-            (
-                {"content": "", "user_id": "user123"},
-                201,
-                {"content": "", "user_id": "user123"}
-            ),
-            # Very long content
-            (
-                {"content": "A" * 1000, "user_id": "user123"},
-                201,
-                {"content": "A" * 1000, "user_id": "user123"}
-            ),
-            # Content with special characters
-            (
-                {"content": "Note with @#$%^&*() chars", "user_id": "user123"},
-                201,
-                {"content": "Note with @#$%^&*() chars", "user_id": "user123"}
-            ),
-            # Content with unicode
-            (
-                {"content": "Note with unicode: café résumé 🚀", "user_id": "user123"},
-                201,
-                {"content": "Note with unicode: café résumé 🚀", "user_id": "user123"}
-            ),
-        ])
-        def test_create_note_success(self, client, note_data, expected_status, expected_response):
-            """Test successful note creation with various content types."""
-            response = client.post("/notes/", json=note_data)
-            
-            assert response.status_code == expected_status
-            response_data = response.json()
-            
-            # Check that required fields are present
-            assert "id" in response_data
-            assert "created_at" in response_data
-            assert "updated_at" in response_data
-            assert "metadata" in response_data
-            
-            # Check that content and user_id match
-            assert response_data["content"] == expected_response["content"]
-            assert response_data["user_id"] == expected_response["user_id"]
-            
-            # Check that timestamps are valid
-            assert response_data["created_at"] == response_data["updated_at"]
-
         @pytest.mark.parametrize("invalid_data,expected_status", [
             # Missing content
             (
@@ -186,30 +159,9 @@ class TestNotesRouterIntegration:
     class TestGetNotes:
         """Test GET /notes endpoint."""
 
-        def test_get_notes_success(self, client, notes_service, sample_note):
+        def test_get_notes_success(self, client, sample_note, seeded):
             """Test successful retrieval of user notes."""
-            # Create additional notes for the same user
-            note2 = Note(
-                id=uuid4(),
-                content="Second test note",
-                user_id=sample_note.user_id,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-                metadata={}
-            )
-            notes_service._notes[note2.id] = note2
-            
-            # Create a note for a different user
-            other_user_note = Note(
-                id=uuid4(),
-                content="Other user's note",
-                user_id="other_user",
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-                metadata={}
-            )
-            notes_service._notes[other_user_note.id] = other_user_note
-            
+            # Seeded with another note for the same user and one for a different user
             response = client.get(f"/notes/?user_id={sample_note.user_id}")
             
             assert response.status_code == 200
@@ -220,6 +172,24 @@ class TestNotesRouterIntegration:
             user_ids = [note["user_id"] for note in notes]
             assert all(uid == sample_note.user_id for uid in user_ids)
 
+        def test_get_notes_newest_first(self, client, notes_service, sample_note):
+            """Test that notes are returned newest first, including notes stored out of order."""
+            older_note = make_note(
+                "Backfilled note",
+                sample_note.user_id,
+                created_at=datetime(2020, 1, 1, tzinfo=timezone.utc)
+            )
+            notes_service._store_note(older_note)
+            
+            response = client.post("/notes/", json={"content": "Newest note", "user_id": sample_note.user_id})
+            newest_id = response.json()["id"]
+            
+            response = client.get(f"/notes/?user_id={sample_note.user_id}")
+            
+            assert response.status_code == 200
+            ids = [note["id"] for note in response.json()]
+            assert ids == [newest_id, str(sample_note.id), str(older_note.id)]
+
         def test_get_notes_empty_user(self, client):
             """Test getting notes for a user with no notes."""
             response = client.get("/notes/?user_id=empty_user")
@@ -229,7 +199,7 @@ class TestNotesRouterIntegration:
             assert notes == []
 
         @pytest.mark.parametrize("invalid_user_id,expected_status", [
-            ("", 200),  # Empty user_id returns empty results
+            ("", 422),  # Empty user_id is rejected by query validation
             (None, 422),  # Missing user_id triggers validation error
         ])
         def test_get_notes_validation_errors(self, client, invalid_user_id, expected_status):
@@ -240,11 +210,6 @@ class TestNotesRouterIntegration:
                 response = client.get(f"/notes/?user_id={invalid_user_id}")
             
             assert response.status_code == expected_status
-            
-            # For empty user_id, verify we get an empty array
-            if invalid_user_id == "":
-                notes = response.json()
-                assert notes == []
 
     class TestGetNote:
         """Test GET /notes/{note_id} endpoint."""
@@ -262,28 +227,16 @@ class TestNotesRouterIntegration:
 
         def test_get_note_not_found(self, client):
             """Test getting a note that doesn't exist."""
-            note_id = uuid4()
+            note_id = _MISSING_ID
             response = client.get(f"/notes/{note_id}?user_id=test_user")
             
             assert response.status_code == 404
-            assert "note not found" in response.text.lower()
 
         def test_get_note_unauthorized_user(self, client, sample_note):
             """Test getting a note with unauthorized user."""
             response = client.get(f"/notes/{sample_note.id}?user_id=unauthorized_user")
             
             assert response.status_code == 403
-            assert "access denied" in response.text.lower()
-
-        @pytest.mark.parametrize("invalid_note_id,expected_status", [
-            ("invalid-uuid", 422),  # Invalid UUID format
-            ("123", 422),  # Numeric string
-        ])
-        def test_get_note_invalid_id(self, client, invalid_note_id, expected_status):
-            """Test getting a note with invalid note_id."""
-            response = client.get(f"/notes/{invalid_note_id}?user_id=test_user")
-            
-            assert response.status_code == expected_status
 
     class TestEnrichNote:
         """Test PATCH /notes/{note_id}/enrich endpoint."""
@@ -303,90 +256,121 @@ class TestNotesRouterIntegration:
 
         def test_enrich_note_not_found(self, client):
             """Test enriching a note that doesn't exist."""
-            note_id = uuid4()
+            note_id = _MISSING_ID
             response = client.patch(f"/notes/{note_id}/enrich?user_id=test_user")
             
             assert response.status_code == 404
-            assert "note not found" in response.text.lower()
 
         def test_enrich_note_unauthorized_user(self, client, sample_note):
             """Test enriching a note with unauthorized user."""
             response = client.patch(f"/notes/{sample_note.id}/enrich?user_id=unauthorized_user")
             
             assert response.status_code == 403
-            assert "access denied" in response.text.lower()
 
-        def test_enrich_note_llm_service_error(self, client, sample_note, notes_service):
+        def test_enrich_note_passes_note_to_llm(self, client, sample_note, mock_llm_service):
+            """Test that the stored note is what gets enriched."""
+            response = client.patch(f"/notes/{sample_note.id}/enrich?user_id={sample_note.user_id}")
+            
+            assert response.status_code == 200
+            mock_llm_service.generate_enrichments.assert_awaited_once_with(sample_note)
+
+        def test_stream_enrichments_success(self, client, sample_note, mock_llm_service):
+            """Test that streamed enrichment chunks are forwarded to the client."""
+            chunks = [b'{"summary": ', b'"Test summary"', b'}']
+            
+            async def stream_chunks():
+                for chunk in chunks:
+                    yield chunk
+
+            async def stream(note):
+                return stream_chunks()
+            mock_llm_service.stream_enrichments.side_effect = stream
+            
+            response = client.get(f"/notes/{sample_note.id}/enrich/stream?user_id={sample_note.user_id}")
+            
+            assert response.status_code == 200
+            assert response.content == b"".join(chunks)
+            mock_llm_service.stream_enrichments.assert_awaited_once_with(sample_note)
+
+        def test_stream_enrichments_not_found(self, client):
+            """Test streaming enrichments for a note that doesn't exist."""
+            response = client.get(f"/notes/{_MISSING_ID}/enrich/stream?user_id=test_user")
+            
+            assert response.status_code == 404
+
+        def test_stream_enrichments_unauthorized_user(self, client, sample_note):
+            """Test streaming enrichments with unauthorized user."""
+            response = client.get(f"/notes/{sample_note.id}/enrich/stream?user_id=unauthorized_user")
+            
+            assert response.status_code == 403
+
+        def test_stream_enrichments_llm_service_error(self, error_client, sample_note, mock_llm_service):
+            """Test that an LLM failure when streaming starts is a 500, not an empty 200 stream."""
+            mock_llm_service.stream_enrichments.side_effect = Exception("Gemini API error")
+            
+            response = error_client.get(f"/notes/{sample_note.id}/enrich/stream?user_id={sample_note.user_id}")
+            
+            assert response.status_code == 500
+
+        def test_enrich_note_llm_service_error(self, error_client, sample_note, mock_llm_service):
             """Test enrichment when LLM service fails."""
-            # Mock the Gemini model to raise an exception
-            mock_model = notes_service.llm_service.model
-            mock_model.generate_content_async.side_effect = Exception("Gemini API error")
+            # Mock the LLM service to raise an exception
+            mock_llm_service.generate_enrichments.side_effect = Exception("Gemini API error")
             
-            response = client.patch(f"/notes/{sample_note.id}/enrich?user_id={sample_note.user_id}")
+            response = error_client.patch(f"/notes/{sample_note.id}/enrich?user_id={sample_note.user_id}")
             
             # Should return 500 error due to LLM service failure
             assert response.status_code == 500
 
+    class TestEnrichNotesBatch:
+        """Test batched enrichment through the service, which no endpoint exposes yet."""
+
+        @pytest.mark.asyncio
+        async def test_enrich_notes_batch_success(self, notes_service, sample_note, mock_llm_service):
+            """Test that missing IDs are skipped and results are applied to the notes in order."""
+            # Built per test rather than seeded, since enrichment updates the notes in place
+            second_note = make_note("Second test note", sample_note.user_id)
+            notes_service._store_note(second_note)
+            mock_llm_service.generate_enrichments_batch.return_value = [
+                ENRICHMENT.model_copy(update={"summary": "First summary"}),
+                ENRICHMENT.model_copy(update={"summary": "Second summary"}),
+            ]
+
+            notes = await notes_service.enrich_notes_batch(
+                [sample_note.id, _MISSING_ID, second_note.id], sample_note.user_id
+            )
+
+            assert notes == [sample_note, second_note]
+            assert sample_note.metadata["summary"] == "First summary"
+            assert second_note.metadata["summary"] == "Second summary"
+            mock_llm_service.generate_enrichments_batch.assert_awaited_once_with([sample_note, second_note])
+
+        @pytest.mark.asyncio
+        async def test_enrich_notes_batch_all_missing(self, notes_service, mock_llm_service):
+            """Test that no LLM request is made when none of the notes exist."""
+            notes = await notes_service.enrich_notes_batch([_MISSING_ID], "test_user")
+
+            assert notes == []
+            mock_llm_service.generate_enrichments_batch.assert_not_awaited()
+
+        @pytest.mark.asyncio
+        async def test_enrich_notes_batch_unauthorized_user(self, notes_service, sample_note, mock_llm_service):
+            """Test that another user's note fails the whole batch before any LLM request."""
+            other_users_note = make_note("Other user's note", "other_user")
+            notes_service._store_note(other_users_note)
+
+            with pytest.raises(UnauthorizedAccessError):
+                await notes_service.enrich_notes_batch([sample_note.id, other_users_note.id], sample_note.user_id)
+
+            mock_llm_service.generate_enrichments_batch.assert_not_awaited()
+            assert "summary" not in sample_note.metadata
+
     class TestUpdateNote:
         """Test PATCH /notes/{note_id} endpoint."""
 
-        @pytest.mark.parametrize("note_update,expected_status,expected_content", [
-            # Update content only
-            (
-                {"content": "Updated content"},
-                200,
-                "Updated content"
-            ),
-            # Update metadata only
-            (
-                {"metadata": {"custom_key": "custom_value"}},
-                200,
-                "Test note content for integration testing"  # Content should remain unchanged
-            ),
-            # Update both content and metadata
-            (
-                {
-                    "content": "Updated content and metadata",
-                    "metadata": {"key": "value", "nested": {"deep": "value"}}
-                },
-                200,
-                "Updated content and metadata"
-            ),
-            # Empty content update
-            (
-                {"content": ""},
-                200,
-                ""
-            ),
-            # Very long content update
-            (
-                {"content": "A" * 1000},
-                200,
-                "A" * 1000
-            ),
-        ])
-        def test_update_note_success(self, client, sample_note, note_update, expected_status, expected_content):
-            """Test successful note updates with various data types."""
-            response = client.patch(
-                f"/notes/{sample_note.id}?user_id={sample_note.user_id}",
-                json=note_update
-            )
-            
-            assert response.status_code == expected_status
-            note = response.json()
-            
-            # Check that content was updated if provided
-            if "content" in note_update:
-                assert note["content"] == expected_content
-            
-            # Check that metadata was updated if provided
-            if "metadata" in note_update:
-                for key, value in note_update["metadata"].items():
-                    assert note["metadata"][key] == value
-
         def test_update_note_not_found(self, client):
             """Test updating a note that doesn't exist."""
-            note_id = uuid4()
+            note_id = _MISSING_ID
             note_update = {"content": "Updated content"}
             
             response = client.patch(
@@ -395,7 +379,6 @@ class TestNotesRouterIntegration:
             )
             
             assert response.status_code == 404
-            assert "note not found" in response.text.lower()
 
         def test_update_note_unauthorized_user(self, client, sample_note):
             """Test updating a note with unauthorized user."""
@@ -407,29 +390,19 @@ class TestNotesRouterIntegration:
             )
             
             assert response.status_code == 403
-            assert "access denied" in response.text.lower()
 
         @pytest.mark.parametrize("invalid_update,expected_status", [
             # Invalid content type
             ({"content": 123}, 422),
             # Invalid metadata type
             ({"metadata": "not_a_dict"}, 422),
-            # Invalid UUID in path
-            ("invalid-uuid", 422),
         ])
         def test_update_note_validation_errors(self, client, sample_note, invalid_update, expected_status):
             """Test note updates with invalid data."""
-            if isinstance(invalid_update, str):
-                # Test invalid UUID in path
-                response = client.patch(
-                    f"/notes/{invalid_update}?user_id={sample_note.user_id}",
-                    json={"content": "Updated content"}
-                )
-            else:
-                response = client.patch(
-                    f"/notes/{sample_note.id}?user_id={sample_note.user_id}",
-                    json=invalid_update
-                )
+            response = client.patch(
+                f"/notes/{sample_note.id}?user_id={sample_note.user_id}",
+                json=invalid_update
+            )
             
             assert response.status_code == expected_status
 
@@ -448,46 +421,30 @@ class TestNotesRouterIntegration:
 
         def test_delete_note_not_found(self, client):
             """Test deleting a note that doesn't exist."""
-            note_id = uuid4()
+            note_id = _MISSING_ID
             response = client.delete(f"/notes/{note_id}?user_id=test_user")
             
             assert response.status_code == 404
-            assert "note not found" in response.text.lower()
 
         def test_delete_note_unauthorized_user(self, client, sample_note):
             """Test deleting a note with unauthorized user."""
             response = client.delete(f"/notes/{sample_note.id}?user_id=unauthorized_user")
             
             assert response.status_code == 403
-            assert "access denied" in response.text.lower()
 
-        @pytest.mark.parametrize("invalid_note_id,expected_status", [
-            ("invalid-uuid", 422),  # Invalid UUID format
-            ("123", 422),  # Numeric string
-            ("", 405),  # Empty string (405 Method Not Allowed when endpoint is on root /notes endpoint)
-        ])
-        def test_delete_note_invalid_id(self, client, invalid_note_id, expected_status):
-            """Test deleting a note with invalid note_id."""
-            response = client.delete(f"/notes/{invalid_note_id}?user_id=test_user")
+        def test_delete_note_empty_id(self, client):
+            """Test deleting with an empty note_id, which resolves to the root /notes endpoint."""
+            response = client.delete("/notes/?user_id=test_user")
             
-            assert response.status_code == expected_status
+            # 405 Method Not Allowed, since the root /notes endpoint doesn't accept DELETE
+            assert response.status_code == 405
 
     class TestGetServiceStats:
         """Test GET /notes/stats/info endpoint."""
 
-        def test_get_service_stats_success(self, client, notes_service, sample_note):
+        def test_get_service_stats_success(self, client, seeded):
             """Test successful retrieval of service statistics."""
-            # Create additional notes to test stats
-            note2 = Note(
-                id=uuid4(),
-                content="Second test note",
-                user_id="user456",
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-                metadata={}
-            )
-            notes_service._notes[note2.id] = note2
-            
+            # Seeded with three notes across two users
             response = client.get("/notes/stats/info")
             
             assert response.status_code == 200
@@ -499,14 +456,14 @@ class TestNotesRouterIntegration:
             assert "storage_type" in stats
             
             # Check that values are correct
-            assert stats["total_notes"] == 2
+            assert stats["total_notes"] == len(seeded)
             assert stats["unique_users"] == 2
             assert stats["storage_type"] == "in_memory"
 
         def test_get_service_stats_empty(self, client, notes_service):
             """Test service stats when no notes exist."""
             # Ensure no notes exist
-            notes_service._notes.clear()
+            notes_service._clear_notes()
             
             response = client.get("/notes/stats/info")
             
@@ -517,20 +474,63 @@ class TestNotesRouterIntegration:
             assert stats["unique_users"] == 0
             assert stats["storage_type"] == "in_memory"
 
+        def test_get_service_stats_after_delete(self, client, sample_note):
+            """Test that a user whose last note is deleted is no longer counted."""
+            client.delete(f"/notes/{sample_note.id}?user_id={sample_note.user_id}")
+            
+            response = client.get("/notes/stats/info")
+            
+            assert response.status_code == 200
+            stats = response.json()
+            
+            assert stats["total_notes"] == 0
+            assert stats["unique_users"] == 0
+
     class TestRouterErrorHandling:
         """Test router-level error handling."""
 
-        def test_router_handles_service_exceptions(self, client, sample_note, notes_service):
+        def test_router_handles_service_exceptions(self, error_client, sample_note, mock_llm_service):
             """Test that router properly handles service exceptions."""
-            # Mock the Gemini model to raise an exception
-            mock_model = notes_service.llm_service.model
-            mock_model.generate_content_async.side_effect = Exception("Service error")
+            # Mock the LLM service to raise an exception
+            mock_llm_service.generate_enrichments.side_effect = Exception("Service error")
             
-            response = client.patch(f"/notes/{sample_note.id}/enrich?user_id={sample_note.user_id}")
+            response = error_client.patch(f"/notes/{sample_note.id}/enrich?user_id={sample_note.user_id}")
             
             # Should return 500 error due to unhandled service exception
             assert response.status_code == 500
 
+        def test_error_message_bodies(self, client, sample_note):
+            """Test the response bodies for missing notes and notes owned by another user."""
+            response = client.get(f"/notes/{_MISSING_ID}?user_id=test_user")
+            assert response.status_code == 404
+            assert response.json() == {"detail": "Note not found"}
+            
+            response = client.get(f"/notes/{sample_note.id}?user_id=unauthorized_user")
+            assert response.status_code == 403
+            assert response.json() == {"detail": "Access denied: Note does not belong to this user"}
+
+        @pytest.mark.parametrize("method,url_template", [
+            ("GET", "/notes/{id}"),
+            ("PATCH", "/notes/{id}"),
+            ("DELETE", "/notes/{id}"),
+            ("PATCH", "/notes/{id}/enrich"),
+            ("GET", "/notes/{id}/enrich/stream"),
+        ])
+        @pytest.mark.parametrize("invalid_note_id", [
+            "invalid-uuid",  # Invalid UUID format
+            "123",  # Numeric string
+        ])
+        def test_invalid_uuid_paths(self, client, method, url_template, invalid_note_id):
+            """Test that every note endpoint rejects a note_id that isn't a UUID."""
+            # A valid body, so only the path can fail validation
+            response = client.request(
+                method,
+                f"{url_template.format(id=invalid_note_id)}?user_id=test_user",
+                json={"content": "Updated content"}
+            )
+            
+            assert response.status_code == 422
+
         def test_router_handles_validation_errors(self, client):
             """Test that router properly handles validation errors."""
             # Test with invalid JSON
@@ -552,51 +552,43 @@ class TestNotesRouterIntegration:
     class TestRouterIntegrationScenarios:
         """Test complex integration scenarios."""
 
-        def test_full_note_lifecycle(self, client, notes_service):
-            """Test complete note lifecycle: create, read, update, enrich, delete."""
+        @pytest.mark.parametrize("content,note_update", LIFECYCLE_CASES, ids=LIFECYCLE_IDS)
+        def test_note_lifecycle(self, client, content, note_update):
+            """Test a note's lifecycle end to end: create, update, delete."""
+            user_id = "lifecycle_user"
+            
             # 1. Create note
-            note_data = {"content": "Lifecycle test note", "user_id": "lifecycle_user"}
-            create_response = client.post("/notes/", json=note_data)
+            create_response = client.post("/notes/", json={"content": content, "user_id": user_id})
             assert create_response.status_code == 201
+            created = create_response.json()
             
-            note = create_response.json()
-            note_id = note["id"]
-            user_id = note["user_id"]
-            
-            # 2. Read note
-            read_response = client.get(f"/notes/{note_id}?user_id={user_id}")
-            assert read_response.status_code == 200
-            assert read_response.json()["content"] == note_data["content"]
-            
-            # 3. Update note
-            update_data = {"content": "Updated lifecycle note"}
-            update_response = client.patch(f"/notes/{note_id}?user_id={user_id}", json=update_data)
+            # Check that required fields are present
+            assert "id" in created
+            assert "created_at" in created
+            assert "updated_at" in created
+            assert "metadata" in created
+            
+            # Check that content and user_id match, and timestamps are valid
+            assert created["content"] == content
+            assert created["user_id"] == user_id
+            assert created["created_at"] == created["updated_at"]
+            note_id = created["id"]
+            
+            # 2. Update note
+            update_response = client.patch(f"/notes/{note_id}?user_id={user_id}", json=note_update)
             assert update_response.status_code == 200
-            assert update_response.json()["content"] == update_data["content"]
-            
-            # 4. Enrich note (mock Gemini model)
-            # Set up the mock to return a valid enrichment response
-            mock_response = Mock()
-            mock_response.text = '{"summary": "Lifecycle test summary", "topics": ["test", "lifecycle"], "sentiment": "positive", "key_entities": ["test"], "suggested_tags": ["test"], "complexity_score": 0.8}'
+            updated = update_response.json()
             
-            # Configure the mock model to return our test response
-            mock_model = notes_service.llm_service.model
-            mock_model.generate_content_async.return_value = mock_response
+            # Content is updated if provided, and unchanged otherwise
+            assert updated["content"] == note_update.get("content", content)
             
-            enrich_response = client.patch(f"/notes/{note_id}/enrich?user_id={user_id}")
-            assert enrich_response.status_code == 200
-            
-            enriched_note = enrich_response.json()
-            assert "metadata" in enriched_note
-            assert enriched_note["metadata"]["summary"] == "Lifecycle test summary"
+            # Check that metadata was updated if provided
+            for key, value in note_update.get("metadata", {}).items():
+                assert updated["metadata"][key] == value
             
-            # 5. Delete note
+            # 3. Delete note
             delete_response = client.delete(f"/notes/{note_id}?user_id={user_id}")
             assert delete_response.status_code == 204
-            
-            # 6. Verify deletion
-            verify_response = client.get(f"/notes/{note_id}?user_id={user_id}")
-            assert verify_response.status_code == 404
 
         def test_concurrent_operations(self, client, notes_service):
             """Test concurrent operations on the same note."""
@@ -610,23 +602,17 @@ class TestNotesRouterIntegration:
             user_id = note["user_id"]
             
             # Simulate concurrent updates
-            async def concurrent_update():
-                update_data = {"content": f"Concurrent update {uuid4()}"}
+            def concurrent_update(_):
+                update_data = {"content": f"Concurrent update {next(_ids)}"}
                 response = client.patch(f"/notes/{note_id}?user_id={user_id}", json=update_data)
                 return response.status_code
             
-            # Run multiple concurrent updates
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            try:
-                tasks = [concurrent_update() for _ in range(5)]
-                results = loop.run_until_complete(asyncio.gather(*tasks))
-                
-                # All updates should succeed
-                assert all(status == 200 for status in results)
-            finally:
-                loop.close()
+            # Run multiple concurrent updates from separate threads
+            with ThreadPoolExecutor(max_workers=5) as executor:
+                results = list(executor.map(concurrent_update, range(5)))
+            
+            # All updates should succeed
+            assert all(status == 200 for status in results)
             
             # Verify final state
             final_response = client.get(f"/notes/{note_id}?user_id={user_id}")